@@ -0,0 +1,194 @@
+"""Headless batch decoding of image folders, globs and video files.
+
+Usage:
+    python batch_decode.py labels/ -o scans.csv
+    python batch_decode.py "photos/*.jpg" -o scans.xlsx --workers 8
+    python batch_decode.py conveyor.mp4 -o scans.xml
+    python batch_decode.py "synthetic:count=1000,noise=8" -o scans.csv
+    python batch_decode.py "synthetic:count=200" -o scans.csv --profile
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+
+import sinks
+from decoding import BACKENDS, calibrate, create_backend, format_report, to_gray
+from frame_sources import ImageDirectorySource, VideoFileSource, open_source
+from profiling import Profiler
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v")
+
+
+CALIBRATION_SAMPLE = 20
+
+# Decoder backend per worker process, created on first use
+_backends = {}
+
+
+def decode_image(frame, backend="pyzbar", symbols=None):
+    """Decode every symbol in a BGR/grayscale frame into a list of strings"""
+    if frame is None:
+        return []
+    key = (backend, tuple(symbols) if symbols else None)
+    if key not in _backends:
+        _backends[key] = create_backend(backend, symbols)
+    return [result.data for result in _backends[key](to_gray(frame))]
+
+
+def decode_image_file(path, backend="pyzbar", symbols=None):
+    """Worker entry point: read an image from disk and decode it"""
+    return decode_image(cv2.imread(path), backend, symbols)
+
+
+class DecodeTask:
+    """Picklable decode call bound to a backend, for the process pool"""
+
+    def __init__(self, fn, backend, symbols):
+        self.fn = fn
+        self.backend = backend
+        self.symbols = symbols
+
+    def __call__(self, item):
+        return self.fn(item, self.backend, self.symbols)
+
+
+def ordered_map(executor, fn, items, window):
+    """Like executor.map, but keeps at most ``window`` tasks in flight.
+
+    Results are yielded in input order without materialising the whole
+    input (a long video would not fit in memory).
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def choose_backend(sample_frames, symbols):
+    """Calibrate on sample frames for the symbologies that will be decoded
+    (``symbols`` None is all of them, as in ``decode_image``); returns the
+    winning backend name"""
+    name, _, report = calibrate(sample_frames, symbols)
+    print(f"Decoder calibration: {format_report(report)} -> {name}")
+    return name
+
+
+def batch_decode(target, output, file_format=None, workers=None, sl_no=1,
+                 backend="auto", symbols=None, tracer=None):
+    """Decode ``target`` across a process pool and write rows to ``output``.
+
+    ``backend`` is a decoder backend name or "auto" to calibrate on the
+    first few inputs. ``tracer`` (e.g. ``profiling.Profiler``) gets the
+    time spent waiting for each result and writing its rows. Returns
+    (items processed, codes written, elapsed seconds).
+    """
+    file_format = file_format or sinks.format_for_path(output)
+    workers = workers or os.cpu_count() or 1
+
+    if os.path.isfile(target) and target.lower().endswith(VIDEO_EXTENSIONS):
+        source = VideoFileSource(target, realtime=False)
+        if not source.isOpened():
+            raise ValueError(f"Unable to open video: {target}")
+        fn, items = decode_image, source.frames()
+    elif target.startswith("synthetic"):
+        source = open_source(target)
+        if source.count is None:
+            raise ValueError("Synthetic batch input needs a frame count, e.g. synthetic:count=1000")
+        fn, items = decode_image, source.frames()
+    else:
+        # Workers read the files themselves so only paths cross the process boundary
+        items = ImageDirectorySource(target).paths
+        if not items:
+            raise ValueError(f"No images found for: {target}")
+        fn = decode_image_file
+
+    if backend == "auto":
+        if fn is decode_image_file:
+            sample = [cv2.imread(path) for path in items[:CALIBRATION_SAMPLE]]
+        else:
+            sample = list(itertools.islice(items, CALIBRATION_SAMPLE))
+            items = itertools.chain(sample, items)
+        backend = choose_backend([frame for frame in sample if frame is not None], symbols)
+    task = DecodeTask(fn, backend, symbols)
+
+    processed = written = 0
+    start = time.perf_counter()
+    sink = None
+    try:
+        # Only create the output once the inputs are known to be usable
+        sink = sinks.open_sink(output, file_format)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            waited = time.perf_counter()
+            for codes in ordered_map(executor, task, items, workers * 4):
+                processed += 1
+                received = time.perf_counter()
+                for data in codes:
+                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    sink.write(sl_no, timestamp, data)
+                    sl_no += 1
+                    written += 1
+                if tracer is not None:
+                    done = time.perf_counter()
+                    tracer.stage(processed, "wait", waited, received)
+                    tracer.stage(processed, "write", received, done)
+                waited = time.perf_counter()
+    finally:
+        if sink is not None:
+            sink.close()
+    return processed, written, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decode QR codes from images or video without the GUI")
+    parser.add_argument("input", help="image directory, glob pattern, video file or synthetic:count=N[,...]")
+    parser.add_argument("-o", "--output", required=True, help="output .csv, .xml or .xlsx file")
+    parser.add_argument("-f", "--format", choices=sorted(sinks.FILE_WRITERS),
+                        help="output format (default: from the output extension)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="decoder processes (default: all cores)")
+    parser.add_argument("-b", "--backend", default="auto", choices=["auto"] + list(BACKENDS),
+                        help="decoder backend; auto calibrates on the first inputs (default)")
+    parser.add_argument("-s", "--symbols", default=None,
+                        help="comma-separated symbologies, e.g. QRCODE,CODE128 (default: all)")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile this run into --profile-dir (cProfile covers this process; "
+                             "decoding itself runs in the worker processes)")
+    parser.add_argument("--profile-dir", default="profiles",
+                        help="parent folder for timestamped profile output (default: profiles)")
+    args = parser.parse_args(argv)
+    symbols = args.symbols.split(",") if args.symbols else None
+
+    run, profiler = batch_decode, None
+    if args.profile:
+        profiler = Profiler(args.profile_dir, duration=None)
+        profiler.start()
+        run = profiler.profiled(batch_decode)
+    try:
+        processed, written, elapsed = run(
+            args.input, args.output, args.format, args.workers,
+            backend=args.backend, symbols=symbols, tracer=profiler)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if profiler is not None:
+            print(f"Profile written to {profiler.stop()}")
+
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Decoded {processed} images, wrote {written} codes to {args.output} "
+          f"in {elapsed:.2f}s ({rate:.1f} images/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
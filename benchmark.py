@@ -0,0 +1,309 @@
+"""Offline benchmarks for decoding and scan writing.
+
+Usage:
+    python benchmark.py                         # everything, results in benchmark-results.json
+    python benchmark.py --only decode --resolutions 640x480,1920x1080
+    python benchmark.py --sizes 0,1000,10000 --baseline last-week.json
+
+Measures:
+    * decoder frames/s (and hit rate) at several resolutions on synthetic QR frames
+    * p50/p99 per-row latency of the save_to_* functions and of the sinks the
+      app uses now, with the target already holding 0..100k rows
+    * end-to-end scans/s through the desktop app's ``process_scan``
+      (needs a display; skipped otherwise)
+
+These are not tests: nothing passes or fails. Compare the JSON output of two
+runs with ``--baseline``.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+
+import sinks
+from decoding import DecodeLadder, available_backends, to_gray
+from fake_sheets import FakeSheetsService
+from frame_sources import SyntheticQRSource
+
+TIMESTAMP = '%Y-%m-%d %H:%M:%S'
+SHEET_ID = "benchmark-sheet"
+
+# Rows timed per target size; the legacy writers rewrite the whole file per row
+DEFAULT_SAMPLES = {
+    "save_to_csv": 200,
+    "save_to_xml": 20,
+    "save_to_excel": 5,
+    "save_to_google_sheets": 50,
+    "CsvSink": 500,
+    "XmlSink": 500,
+    "ExcelSink": 500,
+    "SheetsWriter": 500,
+}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_summary(seconds):
+    return {'samples': len(seconds),
+            'p50_ms': percentile(seconds, 0.5) * 1000,
+            'p99_ms': percentile(seconds, 0.99) * 1000,
+            'max_ms': max(seconds) * 1000}
+
+
+def parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def bench_decode(resolutions, frames=30, symbols=("QRCODE",)):
+    """Frames/s of each available backend, on the raw frame and through the ladder"""
+    backends = available_backends(symbols)
+    results = []
+    for width, height in resolutions:
+        source = SyntheticQRSource(width=width, height=height, qr_size=min(width, height) // 3,
+                                   noise=4, seed=1)
+        sample = []
+        for i in range(frames):
+            payload = source.payload_for(i)
+            sample.append((payload, source.render(payload)))
+        for name, backend in backends.items():
+            for mode in ("full-frame", "ladder"):
+                if mode == "ladder":
+                    decode = DecodeLadder(symbols=symbols, backend=backend).decode
+                else:
+                    decode = lambda frame: backend(to_gray(frame))
+                hits = 0
+                start = time.perf_counter()
+                for payload, frame in sample:
+                    hits += any(result.data == payload for result in decode(frame))
+                elapsed = time.perf_counter() - start
+                results.append({'backend': name, 'mode': mode,
+                                'resolution': f"{width}x{height}",
+                                'frames_per_s': len(sample) / elapsed,
+                                'hit_rate': hits / len(sample)})
+                print(f"decode {name:7s} {mode:10s} {width}x{height}: "
+                      f"{results[-1]['frames_per_s']:.1f} frames/s, "
+                      f"{results[-1]['hit_rate']:.0%} hits")
+    return results
+
+
+def rows(start, count):
+    timestamp = datetime.now().strftime(TIMESTAMP)
+    return [(sl_no, timestamp, f"BENCH-{sl_no:08d}") for sl_no in range(start, start + count)]
+
+
+def prefill(file_format, path, count):
+    """Create ``path`` already holding ``count`` rows, written in bulk"""
+    sink = sinks.open_sink(path, file_format, truncate=True)
+    for first in range(1, count + 1, 10000):
+        sink.write_rows(rows(first, min(10000, count + 1 - first)))
+    sink.close()
+
+
+def bench_writes(sizes, workdir, sheets_latency, samples=None):
+    """Per-row write latency for each writer as the target grows"""
+    samples = dict(DEFAULT_SAMPLES, **(samples or {}))
+    files = {"CSV": os.path.join(workdir, "bench.csv"),
+             "XML": os.path.join(workdir, "bench.xml"),
+             "Excel": os.path.join(workdir, "bench.xlsx")}
+    legacy = {"save_to_csv": "CSV", "save_to_xml": "XML", "save_to_excel": "Excel"}
+    current = {"CsvSink": "CSV", "XmlSink": "XML", "ExcelSink": "Excel"}
+    results = []
+
+    def record(writer, size, seconds):
+        results.append(dict(writer=writer, rows_before=size, **latency_summary(seconds)))
+        print(f"write {writer:22s} {size:>7d} rows: p50 {results[-1]['p50_ms']:.3f} ms, "
+              f"p99 {results[-1]['p99_ms']:.3f} ms")
+
+    for size in sizes:
+        for writer, file_format in legacy.items():
+            path = files[file_format]
+            prefill(file_format, path, size)
+            save = getattr(sinks, writer)
+            seconds = []
+            for sl_no, timestamp, data in rows(size + 1, samples[writer]):
+                start = time.perf_counter()
+                save(path, sl_no, timestamp, data)
+                seconds.append(time.perf_counter() - start)
+            record(writer, size, seconds)
+
+        for writer, file_format in current.items():
+            path = files[file_format]
+            prefill(file_format, path, size)
+            sink = sinks.open_sink(path, file_format)
+            seconds = []
+            for sl_no, timestamp, data in rows(size + 1, samples[writer]):
+                start = time.perf_counter()
+                sink.write(sl_no, timestamp, data)
+                seconds.append(time.perf_counter() - start)
+            sink.close()
+            record(writer, size, seconds)
+
+        service = FakeSheetsService(latency=sheets_latency)
+        service.sheets[SHEET_ID] = [list(sinks.HEADERS)] + [list(row) for row in rows(1, size)]
+        seconds = []
+        for sl_no, timestamp, data in rows(size + 1, samples["save_to_google_sheets"]):
+            start = time.perf_counter()
+            sinks.save_to_google_sheets(service, SHEET_ID, sl_no, timestamp, data)
+            seconds.append(time.perf_counter() - start)
+        record("save_to_google_sheets", size, seconds)
+
+        writer = sinks.SheetsWriter(service, SHEET_ID, flush_interval=0.1)
+        seconds = []
+        for sl_no, timestamp, data in rows(size + 1, samples["SheetsWriter"]):
+            start = time.perf_counter()
+            writer.write(sl_no, timestamp, data)
+            seconds.append(time.perf_counter() - start)
+        writer.close()
+        record("SheetsWriter", size, seconds)
+    return results
+
+
+def bench_end_to_end(scans, workdir):
+    """Scans/s through EnhancedQRScannerApp.process_scan into a CSV export"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        print(f"end-to-end: skipped ({e})")
+        return {'skipped': str(e)}
+    root.withdraw()
+
+    cwd = os.getcwd()
+    os.chdir(workdir)  # The app keeps its journal and caches in the working directory
+    try:
+        import startup
+        from qr_google import EnhancedQRScannerApp
+        startup.timer.uninstall()
+
+        app = EnhancedQRScannerApp(root)
+        app.camera_discovery.join()
+        root.update()
+        app.spreadsheet_path = os.path.join(workdir, "end-to-end.csv")
+        app.file_format.set("CSV")
+        start = time.perf_counter()
+        for i in range(scans):
+            app.process_scan(f"E2E-{i:08d}")
+            if i % 100 == 0:
+                root.update()
+        recorded = time.perf_counter() - start
+        while app.export_backlog():
+            root.update()
+            time.sleep(0.005)
+        exported = time.perf_counter() - start
+        app.close_exporters()
+        app.journal.close()
+    finally:
+        os.chdir(cwd)
+        root.destroy()
+
+    result = {'scans': scans,
+              'scans_per_s': scans / recorded,
+              'exported_per_s': scans / exported}
+    print(f"end-to-end: {result['scans_per_s']:.0f} scans/s recorded, "
+          f"{result['exported_per_s']:.0f} scans/s exported to CSV")
+    return result
+
+
+def flatten(results):
+    """Comparable metrics keyed like 'decode/opencv/ladder/1280x720/frames_per_s'"""
+    flat = {}
+    for entry in results.get('decode', []):
+        key = f"decode/{entry['backend']}/{entry['mode']}/{entry['resolution']}"
+        flat[f"{key}/frames_per_s"] = entry['frames_per_s']
+    for entry in results.get('writes', []):
+        key = f"write/{entry['writer']}/{entry['rows_before']}"
+        flat[f"{key}/p50_ms"] = entry['p50_ms']
+        flat[f"{key}/p99_ms"] = entry['p99_ms']
+    end_to_end = results.get('end_to_end') or {}
+    for name in ('scans_per_s', 'exported_per_s'):
+        if name in end_to_end:
+            flat[f"end_to_end/{name}"] = end_to_end[name]
+    return flat
+
+
+def compare(results, baseline, threshold=0.1):
+    """Print metrics that moved more than ``threshold`` against ``baseline``"""
+    current, previous = flatten(results), flatten(baseline)
+    changes = []
+    for key in sorted(current.keys() & previous.keys()):
+        old, new = previous[key], current[key]
+        if not old:
+            continue
+        change = (new - old) / old
+        if abs(change) < threshold:
+            continue
+        higher_is_better = not key.endswith("_ms")
+        better = (change > 0) == higher_is_better
+        changes.append(f"  {'better' if better else 'WORSE ':6s} {key}: "
+                       f"{old:.3f} -> {new:.3f} ({change:+.0%})")
+    print(f"Compared with baseline ({len(current.keys() & previous.keys())} metrics):")
+    print("\n".join(changes) if changes else "  no changes beyond "
+          f"{threshold:.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decode and write benchmarks (offline)")
+    parser.add_argument("-o", "--output", default="benchmark-results.json",
+                        help="where to write the JSON results (default: benchmark-results.json)")
+    parser.add_argument("--only", choices=["decode", "writes", "end-to-end"], action="append",
+                        help="run only these benchmarks (repeatable)")
+    parser.add_argument("--resolutions", default="640x480,1280x720,1920x1080",
+                        help="comma-separated frame sizes for the decode benchmark")
+    parser.add_argument("--frames", type=int, default=30,
+                        help="synthetic frames decoded per resolution (default: 30)")
+    parser.add_argument("--sizes", default="0,1000,10000,100000",
+                        help="comma-separated row counts already in the target file")
+    parser.add_argument("--sheets-latency", type=float, default=0.05,
+                        help="simulated Sheets API round trip in seconds (default: 0.05)")
+    parser.add_argument("--scans", type=int, default=2000,
+                        help="scans pushed through process_scan (default: 2000)")
+    parser.add_argument("--baseline", default=None,
+                        help="previous results file to compare against")
+    args = parser.parse_args(argv)
+    selected = set(args.only or ["decode", "writes", "end-to-end"])
+
+    results = {'meta': {'started': datetime.now().isoformat(timespec='seconds'),
+                        'python': platform.python_version(),
+                        'platform': platform.platform(),
+                        'processor': platform.processor(),
+                        'cpu_count': os.cpu_count(),
+                        'opencv': cv2.__version__}}
+    workdir = tempfile.mkdtemp(prefix="qr-benchmark-")
+    try:
+        if "decode" in selected:
+            results['decode'] = bench_decode(
+                [parse_resolution(text) for text in args.resolutions.split(",")], args.frames)
+        if "writes" in selected:
+            results['writes'] = bench_writes(
+                [int(size) for size in args.sizes.split(",")], workdir, args.sheets_latency)
+        if "end-to-end" in selected:
+            results['end_to_end'] = bench_end_to_end(args.scans, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import cv2
+
+CACHE_PATH = "cameras.json"
+
+
+def candidate_indices(max_index=10):
+    """Camera indices worth probing.
+
+    On Linux the ``/dev/video*`` nodes are listed first so absent devices
+    are never opened; elsewhere (or when nothing is listed) every index
+    below ``max_index`` is a candidate.
+    """
+    if sys.platform.startswith("linux"):
+        indices = []
+        for path in glob.glob("/dev/video*"):
+            match = re.fullmatch(r"video(\d+)", os.path.basename(path))
+            if match and int(match.group(1)) < max_index:
+                indices.append(int(match.group(1)))
+        if indices:
+            return sorted(indices)
+    return list(range(max_index))
+
+
+def probe_camera(index):
+    """True if OpenCV can open camera ``index``"""
+    cap = cv2.VideoCapture(index)
+    try:
+        return cap.isOpened()
+    finally:
+        cap.release()
+
+
+def discover_cameras(max_index=10, timeout=2.0):
+    """Probe the candidate indices in parallel; returns the ones that opened.
+
+    Each probe runs on its own daemon thread and gets ``timeout`` seconds;
+    a device that hangs inside the driver is left behind rather than
+    holding up the others (or interpreter exit).
+    """
+    found = {}
+
+    def probe(index):
+        try:
+            found[index] = probe_camera(index)
+        except Exception:
+            found[index] = False
+
+    threads = [threading.Thread(target=probe, args=(index,), name=f"camera-probe-{index}",
+                                daemon=True)
+               for index in candidate_indices(max_index)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    return sorted(index for index, ok in list(found.items()) if ok)
+
+
+def load_cached_cameras(path=CACHE_PATH):
+    """Camera list saved by the last discovery, or None"""
+    try:
+        with open(path) as f:
+            cameras = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cameras, list) or not all(isinstance(i, int) for i in cameras):
+        return None
+    return cameras
+
+
+def save_cached_cameras(cameras, path=CACHE_PATH):
+    try:
+        with open(path, "w") as f:
+            json.dump(list(cameras), f)
+    except OSError:
+        pass
+
+
+def discover_async(callback, max_index=10, timeout=2.0, cache_path=CACHE_PATH):
+    """Run ``discover_cameras`` on a background thread.
+
+    ``callback(cameras)`` is called from that thread with the fresh list,
+    which is also written to the cache for the next startup. Returns the
+    thread.
+    """
+    def run():
+        cameras = discover_cameras(max_index, timeout)
+        if cameras:
+            save_cached_cameras(cameras, cache_path)
+        callback(cameras)
+
+    thread = threading.Thread(target=run, name="camera-discovery", daemon=True)
+    thread.start()
+    return thread
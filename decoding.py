@@ -0,0 +1,290 @@
+import time
+from collections import Counter, namedtuple
+
+import cv2
+import numpy as np
+
+from metrics import DISABLED
+
+# A decoded symbol: text payload and polygon corners in full-frame pixels
+Decoded = namedtuple("Decoded", ["data", "polygon"])
+
+
+def zbar_symbols(names):
+    """Map symbology names ("QRCODE", "CODE128", ...) to ZBarSymbol values"""
+    if not names:
+        return None
+    from pyzbar.pyzbar import ZBarSymbol
+
+    try:
+        return [ZBarSymbol[name.strip().upper()] for name in names]
+    except KeyError as e:
+        raise ValueError(f"Unknown symbology: {e.args[0]}")
+
+
+def pyzbar_decode(image, symbols=None):
+    """Decode with pyzbar into ``Decoded`` tuples, optionally limited to ``symbols``"""
+    from pyzbar.pyzbar import decode
+
+    return [Decoded(obj.data.decode("utf-8"), [(p.x, p.y) for p in obj.polygon])
+            for obj in decode(image, symbols=symbols)]
+
+
+class PyzbarBackend:
+    """zbar via pyzbar; handles every symbology zbar knows"""
+
+    name = "pyzbar"
+
+    def __init__(self, symbols=("QRCODE",)):
+        self.symbols = zbar_symbols(symbols)
+
+    def __call__(self, image):
+        return pyzbar_decode(image, self.symbols)
+
+
+class OpenCVBackend:
+    """OpenCV ``QRCodeDetector.detectAndDecodeMulti``; QR codes only"""
+
+    name = "opencv"
+
+    def __init__(self, symbols=("QRCODE",)):
+        if symbols and "QRCODE" not in [name.strip().upper() for name in symbols]:
+            raise ValueError("The OpenCV backend only decodes QR codes")
+        self.detector = cv2.QRCodeDetector()
+
+    def __call__(self, image):
+        found, texts, points, _ = self.detector.detectAndDecodeMulti(image)
+        if not found or points is None:
+            return []
+        return [Decoded(text, [(int(x), int(y)) for x, y in corners])
+                for text, corners in zip(texts, points) if text]
+
+
+BACKENDS = {
+    PyzbarBackend.name: PyzbarBackend,
+    OpenCVBackend.name: OpenCVBackend,
+}
+
+
+def create_backend(name, symbols=("QRCODE",)):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown decoder backend: {name}")
+    return BACKENDS[name](symbols)
+
+
+def default_backend(symbols=("QRCODE",)):
+    """pyzbar when the zbar library is installed, otherwise OpenCV"""
+    try:
+        return PyzbarBackend(symbols)
+    except (ImportError, OSError):
+        return OpenCVBackend(symbols)
+
+
+def available_backends(symbols=("QRCODE",)):
+    """Backends that can be used here (pyzbar needs the zbar shared library)"""
+    backends = {}
+    for name, backend_class in BACKENDS.items():
+        try:
+            backend = backend_class(symbols)
+            backend(np.zeros((8, 8), dtype=np.uint8))
+        except (ImportError, OSError, ValueError):
+            continue
+        backends[name] = backend
+    return backends
+
+
+def calibrate(frames, symbols=("QRCODE",), target_hit_rate=0.9, expected=None,
+              backends=None):
+    """Time each available backend on sample frames and pick one.
+
+    Returns ``(name, backend, report)`` where ``report`` maps each backend
+    name to ``{'hit_rate': ..., 'ms_per_frame': ...}``. The winner is the
+    fastest backend reaching ``target_hit_rate``, or the one with the best
+    hit rate if none does. ``expected`` optionally lists the payload in
+    each frame so a wrong decode doesn't count as a hit.
+    """
+    frames = [to_gray(frame) for frame in frames]
+    if not frames:
+        raise ValueError("Calibration needs at least one frame")
+    backends = backends or available_backends(symbols)
+    if not backends:
+        raise ValueError("No decoder backend is available")
+
+    report = {}
+    for name, backend in backends.items():
+        hits = 0
+        start = time.perf_counter()
+        for i, frame in enumerate(frames):
+            results = backend(frame)
+            if expected is not None:
+                hits += any(r.data == expected[i] for r in results)
+            else:
+                hits += bool(results)
+        elapsed = time.perf_counter() - start
+        report[name] = {'hit_rate': hits / len(frames),
+                        'ms_per_frame': elapsed * 1000 / len(frames)}
+
+    qualified = [name for name in report if report[name]['hit_rate'] >= target_hit_rate]
+    if qualified:
+        best = min(qualified, key=lambda name: report[name]['ms_per_frame'])
+    else:
+        best = max(report, key=lambda name: (report[name]['hit_rate'],
+                                             -report[name]['ms_per_frame']))
+    return best, backends[best], report
+
+
+def format_report(report):
+    return ", ".join(f"{name}: {stats['hit_rate']:.0%} hits, {stats['ms_per_frame']:.1f} ms/frame"
+                     for name, stats in report.items())
+
+
+def to_gray(frame):
+    """Single-channel view of a frame; converts BGR/BGRA once"""
+    if frame.ndim == 2:
+        return frame
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def scale_results(results, factor):
+    """Map polygons found in a resized image back to the original scale"""
+    if factor == 1.0:
+        return results
+    return [Decoded(r.data, [(int(round(x / factor)), int(round(y / factor))) for x, y in r.polygon])
+            for r in results]
+
+
+class DecodeLadder:
+    """Grayscale, downscale-first decode strategy.
+
+    The image is converted to grayscale once, then decoded at each scale in
+    ``scales`` (smallest first) until something is found. As a last resort
+    the image is upscaled by ``upscale`` when the result stays below
+    ``max_upscale_pixels`` -- typically a tracked crop, never a full 1080p
+    frame. ``symbols`` restricts the symbologies searched for (default: QR
+    only). Which rung succeeded is counted in ``hits`` and the most recent
+    one is kept in ``last_rung``. ``backend`` is the decoder each rung
+    calls (default: pyzbar if available). Colour conversion and backend
+    time are recorded in ``metrics``.
+    """
+
+    def __init__(self, scales=(0.5, 1.0), upscale=2.0, symbols=("QRCODE",),
+                 max_upscale_pixels=1280 * 720, backend=None, metrics=None):
+        self.scales = tuple(sorted(scales))
+        self.upscale = upscale
+        self.max_upscale_pixels = max_upscale_pixels
+        self.symbols = symbols
+        self.backend = backend or default_backend(symbols)
+        self.hits = Counter()
+        self.last_rung = None
+        self.metrics = metrics or DISABLED
+
+    def rungs(self, height, width):
+        for scale in self.scales:
+            yield f"x{scale:g}", scale
+        if self.upscale and self.upscale > 1.0 and \
+                height * width * self.upscale ** 2 <= self.max_upscale_pixels:
+            yield f"x{self.upscale:g}", self.upscale
+
+    def decode(self, frame):
+        start = time.perf_counter()
+        gray = to_gray(frame)
+        self.metrics.observe("convert", time.perf_counter() - start)
+        height, width = gray.shape[:2]
+        for name, scale in self.rungs(height, width):
+            if scale == 1.0:
+                image = gray
+            else:
+                size = (max(1, int(width * scale)), max(1, int(height * scale)))
+                interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+                image = cv2.resize(gray, size, interpolation=interpolation)
+            start = time.perf_counter()
+            results = self.backend(image)
+            self.metrics.observe("backend", time.perf_counter() - start, rung=name)
+            if results:
+                self.hits[name] += 1
+                self.last_rung = name
+                return scale_results(results, scale)
+        self.hits["miss"] += 1
+        self.last_rung = None
+        return []
+
+    def summary(self):
+        """Hit counts per rung, e.g. 'x0.5=120 x1=6 x2=1 miss=30'"""
+        names = [f"x{scale:g}" for scale in self.scales]
+        if self.upscale and self.upscale > 1.0:
+            names.append(f"x{self.upscale:g}")
+        return " ".join(f"{name}={self.hits[name]}" for name in names + ["miss"])
+
+
+def offset_results(results, dx, dy):
+    """Shift polygons decoded in a crop back into full-frame coordinates"""
+    if not dx and not dy:
+        return results
+    return [Decoded(r.data, [(x + dx, y + dy) for x, y in r.polygon]) for r in results]
+
+
+def bounding_box(polygons):
+    xs = [x for polygon in polygons for x, _ in polygon]
+    ys = [y for polygon in polygons for _, y in polygon]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class RoiTracker:
+    """Decode a padded crop around the last known code instead of the full frame.
+
+    The polygons from a successful decode seed the region of interest; the
+    next frames only decode that region, padded by ``padding`` times the
+    code size on every side. A full-frame sweep runs every
+    ``full_sweep_every`` frames to pick up new codes, and the region is
+    dropped after ``lost_after`` consecutive misses.
+    """
+
+    def __init__(self, padding=0.5, full_sweep_every=15, lost_after=3):
+        self.padding = padding
+        self.full_sweep_every = full_sweep_every
+        self.lost_after = lost_after
+        self.roi = None
+        self.misses = 0
+        self.frames_since_sweep = 0
+        self.crop_decodes = 0
+        self.full_decodes = 0
+
+    def reset(self):
+        self.roi = None
+        self.misses = 0
+        self.frames_since_sweep = 0
+
+    def _update(self, results, height, width):
+        x0, y0, x1, y1 = bounding_box([r.polygon for r in results])
+        pad_x = int((x1 - x0) * self.padding) + 8
+        pad_y = int((y1 - y0) * self.padding) + 8
+        self.roi = (max(0, x0 - pad_x), max(0, y0 - pad_y),
+                    min(width, x1 + pad_x), min(height, y1 + pad_y))
+        self.misses = 0
+
+    def decode(self, frame, decode_fn):
+        """Decode ``frame`` with ``decode_fn``, using the tracked region when there is one"""
+        height, width = frame.shape[:2]
+        self.frames_since_sweep += 1
+        if self.roi is not None and self.frames_since_sweep < self.full_sweep_every:
+            x0, y0, x1, y1 = self.roi
+            self.crop_decodes += 1
+            results = offset_results(decode_fn(frame[y0:y1, x0:x1]), x0, y0)
+            if results:
+                self._update(results, height, width)
+                return results
+            self.misses += 1
+            if self.misses < self.lost_after:
+                return results
+            self.roi = None
+
+        self.frames_since_sweep = 0
+        self.full_decodes += 1
+        results = decode_fn(frame)
+        if results:
+            self._update(results, height, width)
+        else:
+            self.roi = None
+        return results
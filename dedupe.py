@@ -0,0 +1,166 @@
+import csv
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class DuplicateIndex:
+    """Hash index of recorded codes for O(1) duplicate checks.
+
+    With ``ttl`` (seconds) a code may be recorded again once that long has
+    passed since it was last seen; with ``capacity`` only the most recently
+    seen codes are remembered (LRU). Both default to unlimited, i.e. a plain
+    "never record the same code twice" set.
+    """
+
+    def __init__(self, ttl=None, capacity=None):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.entries = OrderedDict()  # data -> last seen (epoch seconds), oldest first
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, data):
+        return self.is_duplicate(data)
+
+    def _expire(self, now):
+        # Entries are kept in last-seen order, so expired ones are at the front
+        if self.ttl:
+            cutoff = now - self.ttl
+            while self.entries:
+                data, seen = next(iter(self.entries.items()))
+                if seen > cutoff:
+                    break
+                self.entries.popitem(last=False)
+        if self.capacity:
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def is_duplicate(self, data, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            seen = self.entries.get(data)
+            return seen is not None and (not self.ttl or now - seen < self.ttl)
+
+    def add(self, data, seen=None):
+        """Record ``data`` as seen at ``seen`` (default: now)"""
+        seen = time.time() if seen is None else seen
+        with self.lock:
+            self._add(data, seen)
+
+    def _add(self, data, seen):
+        previous = self.entries.get(data)
+        if previous is not None and previous > seen:
+            return
+        self.entries[data] = seen
+        self.entries.move_to_end(data)
+        self._expire(seen)
+
+    def check_and_add(self, data, now=None):
+        """Record ``data``; returns False if it is a duplicate (and records nothing)"""
+        now = time.time() if now is None else now
+        with self.lock:
+            seen = self.entries.get(data)
+            if seen is not None and (not self.ttl or now - seen < self.ttl):
+                return False
+            self._add(data, now)
+            return True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def load(self, items, chunk_size=10000):
+        """Bulk-add (data, timestamp string or None) pairs; returns how many were read.
+
+        Rows are parsed outside the lock and merged ``chunk_size`` at a time,
+        so ``check_and_add`` from the record thread never waits for a whole
+        file to load.
+        """
+        count = 0
+        now = time.time()
+        chunk = []
+        for data, timestamp in items:
+            if data is None:
+                continue
+            seen = now
+            if self.ttl and timestamp:
+                try:
+                    seen = datetime.strptime(str(timestamp), TIMESTAMP_FORMAT).timestamp()
+                except ValueError:
+                    pass
+            chunk.append((str(data), seen))
+            if len(chunk) >= chunk_size:
+                count += self._merge(chunk)
+                chunk = []
+        count += self._merge(chunk)
+        with self.lock:
+            self._expire(now)
+        return count
+
+    def _merge(self, chunk):
+        with self.lock:
+            for data, seen in chunk:
+                self._add(data, seen)
+        return len(chunk)
+
+    def load_file(self, path):
+        """Single streaming pass over an existing CSV, XLSX or XML scan file"""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".xlsx":
+            return self.load(iter_excel(path))
+        if ext == ".xml":
+            return self.load(iter_xml(path))
+        return self.load(iter_csv(path))
+
+
+def header_columns(header):
+    """Indexes of the Data and Timestamp columns in a header row"""
+    header = [str(name).strip() if name is not None else "" for name in header]
+    data_col = header.index("Data") if "Data" in header else len(header) - 1
+    time_col = header.index("Timestamp") if "Timestamp" in header else None
+    return data_col, time_col
+
+
+def iter_csv(path):
+    with open(path, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return
+        data_col, time_col = header_columns(header)
+        for row in reader:
+            if len(row) > data_col:
+                yield row[data_col], row[time_col] if time_col is not None else None
+
+
+def iter_excel(path):
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        data_col, time_col = header_columns(header)
+        for row in rows:
+            if len(row) > data_col:
+                yield row[data_col], row[time_col] if time_col is not None else None
+    finally:
+        wb.close()
+
+
+def iter_xml(path):
+    import xml.etree.ElementTree as ET
+
+    for event, element in ET.iterparse(path, events=("end",)):
+        if element.tag == "scan":
+            yield element.findtext("data"), element.findtext("timestamp")
+            element.clear()
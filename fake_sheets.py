@@ -0,0 +1,96 @@
+import threading
+import time
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class FakeHttpError(Exception):
+    """Stand-in for googleapiclient.errors.HttpError (exposes ``resp.status``)"""
+
+    def __init__(self, status, message="Fake Sheets API error"):
+        super().__init__(f"<HttpError {status}: {message}>")
+        self.resp = FakeResponse(status)
+
+
+class FakeRequest:
+    def __init__(self, action):
+        self.action = action
+
+    def execute(self):
+        return self.action()
+
+
+class FakeValues:
+    def __init__(self, service):
+        self.service = service
+
+    def append(self, spreadsheetId, range, valueInputOption, insertDataOption=None, body=None):
+        return FakeRequest(lambda: self.service.append_rows(spreadsheetId, body['values']))
+
+    def get(self, spreadsheetId, range):
+        return FakeRequest(lambda: {'values': self.service.read_range(spreadsheetId, range)})
+
+    def update(self, spreadsheetId, range, valueInputOption, body=None):
+        return FakeRequest(lambda: self.service.update_header(spreadsheetId, body['values']))
+
+
+class FakeSpreadsheets:
+    def __init__(self, service):
+        self.service = service
+
+    def values(self):
+        return FakeValues(self.service)
+
+    def get(self, spreadsheetId):
+        return FakeRequest(lambda: {'properties': {'title': f"Fake sheet {spreadsheetId}"}})
+
+
+class FakeSheetsService:
+    """In-process fake of the Sheets ``spreadsheets().values()`` endpoint.
+
+    ``latency`` adds a simulated round trip per call and ``fail_every``
+    makes every Nth append raise a retryable error with ``fail_status``
+    (429 by default, i.e. quota exceeded).
+    """
+
+    def __init__(self, latency=0.0, fail_every=0, fail_status=429):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.sheets = {}
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def spreadsheets(self):
+        return FakeSpreadsheets(self)
+
+    def append_rows(self, spreadsheet_id, rows):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            if self.fail_every and self.calls % self.fail_every == 0:
+                raise FakeHttpError(self.fail_status)
+            self.sheets.setdefault(spreadsheet_id, []).extend(list(row) for row in rows)
+        return {'updates': {'updatedRows': len(rows)}}
+
+    def update_header(self, spreadsheet_id, rows):
+        with self.lock:
+            sheet = self.sheets.setdefault(spreadsheet_id, [])
+            sheet[:1] = [list(row) for row in rows]
+        return {}
+
+    def read_range(self, spreadsheet_id, cell_range):
+        """Values for the header row ("A1:C1") or whole columns ("A:B")"""
+        rows = self.rows(spreadsheet_id)
+        if cell_range.startswith("A1:"):
+            rows = rows[:1]
+        width = ord(cell_range[-1].upper()) - ord('A') + 1
+        return [[str(value) for value in row[:width]] for row in rows]
+
+    def rows(self, spreadsheet_id):
+        with self.lock:
+            return list(self.sheets.get(spreadsheet_id, []))
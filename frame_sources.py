@@ -0,0 +1,238 @@
+import glob
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+class FrameSource:
+    """Something the scan loop can pull BGR frames from.
+
+    Mirrors the parts of ``cv2.VideoCapture`` the app uses (``isOpened``,
+    ``read``, ``release``) so a live camera and a replayed recording are
+    interchangeable. Finite sources set ``exhausted`` once they run out.
+    """
+
+    exhausted = False
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def frames(self):
+        """Iterate over frames until the source is exhausted"""
+        try:
+            while not self.exhausted:
+                ret, frame = self.read()
+                if ret:
+                    yield frame
+        finally:
+            self.release()
+
+
+class CameraSource(FrameSource):
+    """Live camera by OpenCV device index"""
+
+    def __init__(self, index=0):
+        self.index = index
+        self.cap = cv2.VideoCapture(index)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """Recorded video replayed at its native frame rate or as fast as possible"""
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0
+        self.frame_interval = 1.0 / fps if fps and fps > 0 else 0.0
+        self._next_frame_at = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        if self.exhausted:
+            return False, None
+        if self.realtime and self.frame_interval:
+            now = time.monotonic()
+            if self._next_frame_at is None:
+                self._next_frame_at = now
+            elif now < self._next_frame_at:
+                time.sleep(self._next_frame_at - now)
+            self._next_frame_at += self.frame_interval
+
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret:
+            self.exhausted = True
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirectorySource(FrameSource):
+    """Images from a directory or glob pattern, in sorted order"""
+
+    def __init__(self, target, loop=False, fps=None):
+        if os.path.isdir(target):
+            paths = [os.path.join(target, name) for name in os.listdir(target)]
+        else:
+            paths = glob.glob(target)
+        self.paths = sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS))
+        self.loop = loop
+        self.frame_interval = 1.0 / fps if fps else 0.0
+        self.position = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        if self.position >= len(self.paths):
+            if not self.loop or not self.paths:
+                self.exhausted = True
+                return False, None
+            self.position = 0
+        path = self.paths[self.position]
+        self.position += 1
+        if self.frame_interval:
+            time.sleep(self.frame_interval)
+        frame = cv2.imread(path)
+        return frame is not None, frame
+
+
+class SyntheticQRSource(FrameSource):
+    """Renders QR codes onto a background with controllable distortions.
+
+    ``noise`` is the std-dev of Gaussian pixel noise (0-255 scale), ``blur``
+    a Gaussian kernel size in pixels and ``rotation`` the maximum rotation in
+    degrees. ``count`` limits the number of frames (None = endless) and
+    ``fps`` paces reads like a camera. The payload rendered into the most
+    recent frame is kept in ``expected`` so callers can measure hit rate.
+    """
+
+    def __init__(self, payloads=None, count=None, width=640, height=480,
+                 qr_size=200, noise=0.0, blur=0, rotation=0.0, fps=None, seed=None):
+        self.payloads = list(payloads) if payloads else None
+        self.count = count
+        self.width = width
+        self.height = height
+        self.qr_size = min(qr_size, width, height)
+        self.noise = noise
+        self.blur = blur
+        self.rotation = rotation
+        self.frame_interval = 1.0 / fps if fps else 0.0
+        self.random = random.Random(seed)
+        self.np_random = np.random.default_rng(seed)
+        self.encoder = cv2.QRCodeEncoder.create()
+        self.produced = 0
+        self.expected = None
+        self._cache = {}
+
+    def payload_for(self, index):
+        if self.payloads:
+            return self.payloads[index % len(self.payloads)]
+        return f"SYN-{index:08d}"
+
+    def render_code(self, payload):
+        """Black-on-white QR symbol scaled to ``qr_size`` with a quiet zone"""
+        if payload not in self._cache:
+            symbol = self.encoder.encode(payload)
+            symbol = cv2.copyMakeBorder(symbol, 4, 4, 4, 4, cv2.BORDER_CONSTANT, value=255)
+            self._cache[payload] = cv2.resize(symbol, (self.qr_size, self.qr_size),
+                                              interpolation=cv2.INTER_NEAREST)
+            if len(self._cache) > 256:
+                self._cache.pop(next(iter(self._cache)))
+        return self._cache[payload]
+
+    def render(self, payload):
+        """Render one BGR frame containing ``payload``"""
+        canvas = np.full((self.height, self.width), 255, dtype=np.uint8)
+        code = self.render_code(payload)
+        size = code.shape[0]
+        x = self.random.randint(0, self.width - size)
+        y = self.random.randint(0, self.height - size)
+        canvas[y:y + size, x:x + size] = code
+
+        if self.rotation:
+            angle = self.random.uniform(-self.rotation, self.rotation)
+            matrix = cv2.getRotationMatrix2D((x + size / 2, y + size / 2), angle, 1.0)
+            canvas = cv2.warpAffine(canvas, matrix, (self.width, self.height),
+                                    borderValue=255)
+        if self.blur:
+            kernel = int(self.blur) | 1
+            canvas = cv2.GaussianBlur(canvas, (kernel, kernel), 0)
+        if self.noise:
+            noisy = canvas + self.np_random.normal(0, self.noise, canvas.shape)
+            canvas = np.clip(noisy, 0, 255).astype(np.uint8)
+        return cv2.cvtColor(canvas, cv2.COLOR_GRAY2BGR)
+
+    def read(self):
+        if self.count is not None and self.produced >= self.count:
+            self.exhausted = True
+            return False, None
+        if self.frame_interval:
+            time.sleep(self.frame_interval)
+        self.expected = self.payload_for(self.produced)
+        self.produced += 1
+        return True, self.render(self.expected)
+
+
+def parse_synthetic_options(spec):
+    """Parse "synthetic:noise=8,blur=3,rotation=15" into keyword arguments"""
+    options = {}
+    _, _, params = spec.partition(":")
+    for pair in filter(None, params.split(",")):
+        key, _, value = pair.partition("=")
+        key = key.strip()
+        if key == "payloads":
+            options[key] = value.split("|")
+        elif key in ("count", "width", "height", "qr_size", "blur", "seed"):
+            options[key] = int(value)
+        elif key in ("noise", "rotation", "fps"):
+            options[key] = float(value)
+        else:
+            raise ValueError(f"Unknown synthetic source option: {key}")
+    return options
+
+
+def open_source(spec, realtime=True):
+    """Build a frame source from a camera index, path, glob or "synthetic[:opts]"
+
+    ``realtime`` controls whether video files replay at their native rate.
+    """
+    if isinstance(spec, FrameSource):
+        return spec
+    if isinstance(spec, int) or str(spec).isdigit():
+        return CameraSource(int(spec))
+    spec = str(spec)
+    if spec == "synthetic" or spec.startswith("synthetic:"):
+        return SyntheticQRSource(**parse_synthetic_options(spec))
+    if os.path.isdir(spec) or any(ch in spec for ch in "*?["):
+        return ImageDirectorySource(spec)
+    if spec.lower().endswith(IMAGE_EXTENSIONS):
+        return ImageDirectorySource(spec)
+    return VideoFileSource(spec, realtime=realtime)
@@ -0,0 +1,229 @@
+import csv
+import io
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from dedupe import TIMESTAMP_FORMAT, header_columns
+
+
+def time_of_day(timestamp):
+    """The time column of a history row for a saved '%Y-%m-%d %H:%M:%S' timestamp"""
+    try:
+        return datetime.strptime(timestamp, TIMESTAMP_FORMAT).strftime('%H:%M:%S')
+    except (TypeError, ValueError):
+        return timestamp  # Some other layout; show it as it is
+
+
+class ScanHistory:
+    """Bounded scan history shown in a Treeview, newest first.
+
+    Scans are kept in a ring buffer of ``capacity`` rows. ``add`` may be
+    called from any thread; the rows are queued and inserted in one batch
+    per ``flush_ms`` tick on the Tk thread. The tree holds at most
+    ``window`` rows while the operator is at the top; scrolling to the
+    bottom pages in ``page_size`` older rows, first from the ring buffer
+    and then from ``load_older(before, limit)`` (e.g. the journal), which
+    returns up to ``limit`` display rows recorded before ``before`` as
+    (recorded_at, values) pairs, newest first. ``before`` is the epoch time
+    of the oldest ring row, or for later pages the ``recorded_at`` of the
+    oldest row ``load_older`` returned, so a loader may use any key there
+    (e.g. a row number) to continue where it stopped. A loader that has to
+    read a file may return None instead and hand the page to
+    ``show_older(before, rows)`` on the Tk thread once it has it.
+    """
+
+    def __init__(self, tree, scrollbar=None, capacity=1000, window=200, page_size=100,
+                 flush_ms=200, load_older=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.rows = deque(maxlen=capacity)  # (recorded_at, values), oldest first
+        self.window = window
+        self.page_size = page_size
+        self.flush_ms = flush_ms
+        self.load_older = load_older
+        self.pending = []
+        self.lock = threading.Lock()
+        self.items = deque()  # (item id, recorded_at, from ring) in tree order
+        self.exhausted = False  # nothing older left to page in
+        self.loading = None  # ``before`` of a page ``load_older`` is still fetching
+        self.job = None
+        tree.configure(yscrollcommand=self._on_scroll)
+        if scrollbar is not None:
+            scrollbar.configure(command=tree.yview)
+
+    def add(self, values, recorded_at=None):
+        """Queue a row for the next flush (safe to call from any thread)"""
+        recorded_at = time.time() if recorded_at is None else recorded_at
+        with self.lock:
+            self.pending.append((recorded_at, values))
+
+    def start(self):
+        if self.job is None:
+            self.job = self.tree.after(self.flush_ms, self._tick)
+
+    def stop(self):
+        if self.job is not None:
+            self.tree.after_cancel(self.job)
+            self.job = None
+
+    def _tick(self):
+        self.flush()
+        self.job = self.tree.after(self.flush_ms, self._tick)
+
+    def flush(self):
+        """Insert queued rows at the top of the tree and trim it to the window"""
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return
+        self.rows.extend(batch)
+        for recorded_at, values in batch:
+            item = self.tree.insert('', 0, values=values)
+            self.items.appendleft((item, recorded_at, True))
+        if self.tree.yview()[0] <= 0.0:
+            self.trim()
+
+    def trim(self):
+        """Drop rows beyond the window from the bottom of the tree"""
+        if len(self.items) <= self.window:
+            return
+        dropped = [self.items.pop()[0] for _ in range(len(self.items) - self.window)]
+        self.tree.delete(*dropped)
+        self.exhausted = False
+        self.loading = None  # A page still on its way would no longer follow on
+
+    def clear(self):
+        with self.lock:
+            self.pending = []
+        self.rows.clear()
+        self.tree.delete(*[item for item, _, _ in self.items])
+        self.items.clear()
+        self.exhausted = False
+        self.loading = None
+
+    def page_older(self):
+        """Append the next page of older rows at the bottom of the tree"""
+        if self.exhausted or self.loading is not None or not self.items:
+            return
+        ring_shown = sum(1 for _, _, from_ring in self.items if from_ring)
+        older = []
+        if ring_shown < len(self.rows) and self.items[-1][2]:
+            end = len(self.rows) - ring_shown
+            older = [(row, True) for row in
+                     reversed(list(self.rows)[max(0, end - self.page_size):end])]
+        if len(older) < self.page_size and self.load_older is not None:
+            before = older[-1][0][0] if older else self.items[-1][1]
+            loaded = self.load_older(before, self.page_size - len(older))
+            if loaded is None:
+                # Delivered later through ``show_older``
+                self.loading = before
+                self._append(older)
+                return
+            older += [(row, False) for row in loaded]
+        if not older:
+            self.exhausted = True
+            return
+        self._append(older)
+
+    def show_older(self, before, rows):
+        """Append a page ``load_older`` fetched in the background (Tk thread).
+
+        ``rows`` None drops the request without ending the paging.
+        """
+        if self.loading is None or before != self.loading:
+            return  # Trimmed or cleared meanwhile
+        self.loading = None
+        if rows is None:
+            return
+        if not rows:
+            self.exhausted = True
+            return
+        self._append([(row, False) for row in rows])
+
+    def _append(self, older):
+        for (recorded_at, values), from_ring in older:
+            item = self.tree.insert('', 'end', values=values)
+            self.items.append((item, recorded_at, from_ring))
+
+    def _on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if float(first) > 0.0 and float(last) >= 1.0:
+            self.page_older()
+
+
+class CsvRowIndex:
+    """Byte offsets of every ``every``-th data row of a CSV scan file.
+
+    Lets old rows be read from near where they are instead of from the top
+    of the file, for ``ScanHistory`` pages. ``update`` only scans what was
+    appended since the last call (stopping before a row that is still being
+    written) and returns the number of complete data rows; ``read(start,
+    stop)`` returns (data, timestamp) pairs for data rows ``start`` to
+    ``stop - 1``. ``base_rows`` is the number of rows in the first ``base``
+    bytes (e.g. the file's size when it was linked) once those are indexed.
+    """
+
+    def __init__(self, path, base=0, every=256):
+        self.path = path
+        self.base = base
+        self.base_rows = None
+        self.every = every
+        self.offsets = []
+        self.rows = 0
+        self.end = None  # where the next update continues; None until the header is read
+        self.columns = None
+        self.lock = threading.Lock()
+
+    def update(self):
+        with self.lock:
+            with open(self.path, 'rb') as f:
+                if self.end is None:
+                    header = f.readline()
+                    if not header.endswith(b"\n"):
+                        return 0
+                    self.columns = header_columns(next(csv.reader([header.decode()])))
+                    self.end = f.tell()
+                f.seek(self.end)
+                start, pending = self.end, b""
+                for line in iter(f.readline, b""):
+                    if self.base_rows is None and start >= self.base:
+                        self.base_rows = self.rows
+                    if not line.endswith(b"\n"):
+                        break
+                    pending += line
+                    if pending.count(b'"') % 2:
+                        continue  # Newline inside a quoted field
+                    if self.rows % self.every == 0:
+                        self.offsets.append(start)
+                    self.rows += 1
+                    start += len(pending)
+                    pending = b""
+                self.end = start
+                if self.base_rows is None and start >= self.base:
+                    self.base_rows = self.rows
+            return self.rows
+
+    def read(self, start, stop):
+        with self.lock:
+            stop = min(stop, self.rows)
+            if start >= stop:
+                return []
+            offset = self.offsets[start // self.every]
+            skip = start % self.every
+            data_col, time_col = self.columns
+        pairs = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            reader = csv.reader(io.TextIOWrapper(f, newline=''))
+            for i, row in enumerate(reader):
+                if i < skip:
+                    continue
+                if i >= skip + stop - start:
+                    break
+                pairs.append((row[data_col] if len(row) > data_col else None,
+                              row[time_col] if time_col is not None and len(row) > time_col
+                              else None))
+        return pairs
@@ -0,0 +1,275 @@
+import sqlite3
+import threading
+import time
+
+from metrics import DISABLED
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    sl_no INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    data TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    frame_id INTEGER,
+    target TEXT
+);
+CREATE INDEX IF NOT EXISTS scans_data ON scans (data);
+CREATE TABLE IF NOT EXISTS exports (
+    name TEXT PRIMARY KEY,
+    file_format TEXT NOT NULL,
+    target TEXT NOT NULL,
+    last_id INTEGER NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1
+);
+"""
+
+
+def export_name(file_format, target):
+    """Key of the export feeding ``target`` in ``file_format``"""
+    return f"{file_format}:{target}"
+
+
+class ScanJournal:
+    """Local SQLite (WAL mode) record of every scan.
+
+    The journal is committed before anything else happens to a scan, so it
+    is the source of truth; CSV/XML/Excel/Sheets outputs are produced from it
+    by ``Exporter`` threads that tail the ``scans`` table. Each row records
+    the export it was saved for, so an export only replays its own rows
+    (rows journaled before targets were recorded go to every export).
+    """
+
+    def __init__(self, path="scans.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.appended = threading.Condition()
+        self.conn = self.connect()
+        self.conn.executescript(SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(scans)")]
+        if "frame_id" not in columns:
+            # Journals written before multi-code frames
+            self.conn.execute("ALTER TABLE scans ADD COLUMN frame_id INTEGER")
+        if "target" not in columns:
+            # Journals written before rows recorded their export
+            self.conn.execute("ALTER TABLE scans ADD COLUMN target TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS scans_target ON scans (target, id)")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(exports)")]
+        if "active" not in columns:
+            # Journals written before unlinked files were detached
+            self.conn.execute("ALTER TABLE exports ADD COLUMN active INTEGER NOT NULL DEFAULT 1")
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL survives application crashes without an fsync per commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def append(self, rows, same_frame=False, target=None):
+        """Commit (sl_no, timestamp, data) rows in one transaction; returns the last id.
+
+        With ``same_frame`` the rows are codes read from one camera frame and
+        share a ``frame_id`` (the id of the first of them). ``target`` is the
+        ``export_name`` of the export the rows are meant for.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                frame_id = None
+                if same_frame:
+                    frame_id = self.conn.execute(
+                        "SELECT COALESCE(MAX(id), 0) + 1 FROM scans").fetchone()[0]
+                self.conn.executemany(
+                    "INSERT INTO scans (sl_no, timestamp, data, recorded_at, frame_id, target) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(row[0], row[1], row[2], now, frame_id, target) for row in rows])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            last_id = self.conn.execute("SELECT MAX(id) FROM scans").fetchone()[0]
+        with self.appended:
+            self.appended.notify_all()
+        return last_id
+
+    def last_id(self):
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM scans").fetchone()[0]
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM scans").fetchone()[0]
+
+    def find(self, data):
+        """All recorded scans of ``data``, oldest first"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, sl_no, timestamp, data FROM scans WHERE data = ? ORDER BY id",
+                (data,)).fetchall()
+
+    def rows_after(self, last_id, limit=500, conn=None, target=None):
+        """Rows with id > ``last_id`` as (id, sl_no, timestamp, data)
+
+        With ``target`` only rows journaled for that export (or before
+        targets were recorded) are returned.
+        """
+        query = "SELECT id, sl_no, timestamp, data FROM scans WHERE id > ?"
+        params = (last_id,)
+        if target is not None:
+            query += " AND (target = ? OR target IS NULL)"
+            params += (target,)
+        query += " ORDER BY id LIMIT ?"
+        params += (limit,)
+        if conn is not None:
+            return conn.execute(query, params).fetchall()
+        with self.lock:
+            return self.conn.execute(query, params).fetchall()
+
+    def count_after(self, last_id, target):
+        """Number of rows for export ``target`` with id > ``last_id``"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM scans WHERE id > ? AND (target = ? OR target IS NULL)",
+                (last_id, target)).fetchone()[0]
+
+    def rows_before(self, before_id=None, limit=100):
+        """Newest rows with id < ``before_id`` (all rows if None) as
+        (id, sl_no, timestamp, data), newest first"""
+        with self.lock:
+            if before_id is None:
+                before_id = self.conn.execute(
+                    "SELECT COALESCE(MAX(id), 0) + 1 FROM scans").fetchone()[0]
+            return self.conn.execute(
+                "SELECT id, sl_no, timestamp, data FROM scans "
+                "WHERE id < ? ORDER BY id DESC LIMIT ?",
+                (before_id, limit)).fetchall()
+
+    def export_cursor(self, name):
+        with self.lock:
+            row = self.conn.execute("SELECT last_id FROM exports WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_export_cursor(self, name, file_format, target, last_id):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO exports (name, file_format, target, last_id) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id, active = 1",
+                (name, file_format, target, last_id))
+
+    def detach_export(self, name):
+        """Stop resuming an export whose target is no longer linked"""
+        with self.lock:
+            self.conn.execute("UPDATE exports SET active = 0 WHERE name = ?", (name,))
+
+    def lagging_exports(self):
+        """Still-linked exports that have not caught up with the journal as (file_format, target)"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT file_format, target FROM exports WHERE active = 1 "
+                "AND EXISTS (SELECT 1 FROM scans WHERE scans.id > exports.last_id "
+                "AND (scans.target = exports.name OR scans.target IS NULL))").fetchall()
+
+    def wait_for_rows(self, timeout):
+        with self.appended:
+            self.appended.wait(timeout)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class Exporter:
+    """Tails the journal and feeds the rows saved for ``target`` to a sink in batches.
+
+    The exporter's position is stored in the journal once the sink has
+    flushed a batch (a sink with an ``unflushed`` row count, such as a
+    batched ``CsvSink``, may hold rows for a while), so after a crash it
+    resumes where it left off (rows written just before the crash may be
+    written a second time). Slow sinks just fall behind;
+    ``lag`` reports how many rows they still have to catch up. Each
+    ``write_rows`` call is timed in ``metrics`` under ``sink_write``.
+    """
+
+    def __init__(self, journal, sink, target, start_id=None, batch_size=500,
+                 poll_interval=0.5, on_error=None, metrics=None):
+        self.journal = journal
+        self.sink = sink
+        self.file_format = sink.file_format
+        self.target = target
+        self.name = export_name(self.file_format, target)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.on_error = on_error
+        self.metrics = metrics or DISABLED
+        # Resume from the stored position; new exports start at the journal's end
+        cursor = start_id
+        if cursor is None:
+            cursor = self.journal.export_cursor(self.name)
+        if cursor is None:
+            cursor = self.journal.last_id()
+        self.last_id = cursor
+        self.saved_id = cursor  # position stored in the journal; rows after it may be unflushed
+        self.journal.set_export_cursor(self.name, self.file_format, target, cursor)
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name=f"export-{self.file_format}",
+                                       daemon=True)
+        self.thread.start()
+
+    @property
+    def lag(self):
+        return self.journal.count_after(self.last_id, self.name)
+
+    def _export_pending(self, conn):
+        while True:
+            rows = self.journal.rows_after(self.last_id, self.batch_size, conn=conn,
+                                           target=self.name)
+            if not rows:
+                return
+            # Each sink applies its own flush/batching policy
+            start = time.perf_counter()
+            self.sink.write_rows([row[1:] for row in rows])
+            self.metrics.observe("sink_write", time.perf_counter() - start, sink=self.file_format)
+            self.metrics.inc("rows_exported", len(rows), sink=self.file_format)
+            self.last_id = rows[-1][0]
+            self._save_cursor()
+
+    def _save_cursor(self):
+        """Store the position once the sink holds nothing unflushed"""
+        if self.saved_id != self.last_id and not getattr(self.sink, "unflushed", 0):
+            self.journal.set_export_cursor(self.name, self.file_format, self.target, self.last_id)
+            self.saved_id = self.last_id
+
+    def _run(self):
+        conn = self.journal.connect()
+        try:
+            while True:
+                try:
+                    self._export_pending(conn)
+                    self._save_cursor()  # Picks up flushes made by the sink's own timer
+                except Exception as e:
+                    if self.on_error:
+                        self.on_error(f"Export to {self.target} failed: {str(e)}")
+                if self.stopping:
+                    return
+                self.journal.wait_for_rows(self.poll_interval)
+        finally:
+            conn.close()
+
+    def close(self, timeout=10.0, detach=False):
+        """Export whatever is left, then stop and close the sink.
+
+        With ``detach`` the target has been unlinked, so the export is not
+        resumed on the next start.
+        """
+        self.stopping = True
+        with self.journal.appended:
+            self.journal.appended.notify_all()
+        self.thread.join(timeout)
+        self.sink.close()
+        if self.saved_id != self.last_id:
+            self.journal.set_export_cursor(self.name, self.file_format, self.target, self.last_id)
+            self.saved_id = self.last_id
+        if detach:
+            self.journal.detach_export(self.name)
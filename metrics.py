@@ -0,0 +1,205 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Latency bucket upper bounds in seconds (Prometheus-style, plus +Inf)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile (None if empty)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def summary(self):
+        return {'count': self.count,
+                'sum': self.total,
+                'mean': self.total / self.count if self.count else None,
+                'p50': self.quantile(0.5),
+                'p99': self.quantile(0.99)}
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+class Metrics:
+    """Counters and latency histograms for the scan stages.
+
+    Call sites record unconditionally; with ``enabled`` False every call
+    returns straight away, so leaving the instrumentation in costs one
+    method call per event. Metric names are plain strings with optional
+    labels, e.g. ``observe("sink_write", 0.002, sink="CSV")``.
+    """
+
+    def __init__(self, enabled=True, prefix="qrscan"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def counter(self, name, **labels):
+        with self.lock:
+            return self.counters.get(_key(name, labels), 0)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """JSON-friendly dict of every counter and histogram summary"""
+        def label(key):
+            name, labels = key
+            if not labels:
+                return name
+            return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+        with self.lock:
+            return {'timestamp': time.time(),
+                    'uptime': time.time() - self.started,
+                    'counters': {label(key): value for key, value in self.counters.items()},
+                    'latency_seconds': {label(key): histogram.summary()
+                                        for key, histogram in self.histograms.items()}}
+
+    def prometheus(self):
+        """Prometheus text exposition format"""
+        def labels_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self.lock:
+            for name in sorted({key[0] for key in self.counters}):
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (key_name, labels), value in sorted(self.counters.items()):
+                    if key_name == name:
+                        lines.append(f"{metric}{labels_text(labels)} {value}")
+            for name in sorted({key[0] for key in self.histograms}):
+                metric = f"{self.prefix}_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for (key_name, labels), histogram in sorted(self.histograms.items()):
+                    if key_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{metric}_bucket{labels_text(labels, [('le', le)])} {cumulative}")
+                    lines.append(f"{metric}_sum{labels_text(labels)} {histogram.total}")
+                    lines.append(f"{metric}_count{labels_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+DISABLED = Metrics(enabled=False)
+
+
+class RateTracker:
+    """Per-interval rates from monotonically increasing counters (for the status bar)"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.last = {}
+        self.last_time = time.monotonic()
+
+    def rates(self, *names):
+        """Counter increase per second since the previous call, by name"""
+        now = time.monotonic()
+        elapsed = max(now - self.last_time, 1e-6)
+        rates = {}
+        for name in names:
+            value = self.metrics.counter(name)
+            rates[name] = (value - self.last.get(name, value)) / elapsed
+            self.last[name] = value
+        self.last_time = now
+        return rates
+
+
+def write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """Writes ``metrics.json`` and ``metrics.prom`` to ``directory`` every ``interval`` seconds"""
+
+    def __init__(self, metrics, directory="metrics", interval=10.0):
+        self.metrics = metrics
+        self.directory = directory
+        self.interval = interval
+        self.stopping = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+        self.thread.start()
+
+    def export(self):
+        write_atomic(os.path.join(self.directory, "metrics.json"),
+                     json.dumps(self.metrics.snapshot(), indent=2))
+        write_atomic(os.path.join(self.directory, "metrics.prom"), self.metrics.prometheus())
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            if self.metrics.enabled:
+                try:
+                    self.export()
+                except OSError:
+                    pass
+
+    def close(self):
+        """Stop and write a final snapshot"""
+        self.stopping.set()
+        self.thread.join(timeout=2)
+        if self.metrics.enabled:
+            try:
+                self.export()
+            except OSError:
+                pass
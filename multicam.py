@@ -0,0 +1,221 @@
+import heapq
+import itertools
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from metrics import DISABLED
+from pipeline import ScanPipeline, DROP_OLDEST
+
+
+def tile_frames(frames, tile_width=640):
+    """Lay frames out in a grid (two per row from three up), each scaled to ``tile_width``"""
+    tiles = []
+    for frame in frames:
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        height, width = frame.shape[:2]
+        size = (tile_width, max(1, int(height * tile_width / width)))
+        tiles.append(cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                     if size != (width, height) else frame)
+    tile_height = max(tile.shape[0] for tile in tiles)
+    tiles = [cv2.copyMakeBorder(tile, 0, tile_height - tile.shape[0], 0, 0,
+                                cv2.BORDER_CONSTANT, value=0) for tile in tiles]
+    columns = 1 if len(tiles) == 1 else 2
+    if len(tiles) % columns:
+        tiles.append(np.zeros_like(tiles[0]))
+    rows = [np.hstack(tiles[i:i + columns]) for i in range(0, len(tiles), columns)]
+    return rows[0] if len(rows) == 1 else np.vstack(rows)
+
+
+class MultiCameraScan:
+    """Several cameras scanned at once into one ordered stream of results.
+
+    Every camera gets its own ``ScanPipeline`` capture and decode threads,
+    with its own ``decode_frame(camera, frame)`` call so per-camera state
+    (ROI tracking, decoder objects) never crosses threads. Instead of one
+    record thread per camera, a single merge thread collects the decoded
+    frames and calls ``handle_results(frame, results, camera)`` one at a
+    time in capture order: a result is released once every other camera
+    has decoded past its capture time, or after ``reorder_ms`` at most so a
+    stalled camera can't hold the rest up. Recording (dedupe, serial
+    numbers, sinks) therefore stays single-threaded, as with one camera.
+    A payload one camera delivered is dropped from the other cameras'
+    results while they see it within ``reorder_ms`` of its last sighting, so
+    a code in view of two cameras is recorded once even without the app's
+    own duplicate check (a result or ``Decoded`` is matched on its ``data``).
+
+    Exposes the parts of ``ScanPipeline`` the GUI uses (``running``,
+    ``paused``, ``pause``/``resume``, ``latest_preview``, ``tracer``,
+    ``stop``); the preview is a grid of the cameras' latest frames.
+    """
+
+    def __init__(self, cameras, open_source, decode_frame, handle_results, reorder_ms=500,
+                 queue_size=1, drop_policy=DROP_OLDEST, on_error=None, metrics=None,
+                 poll_interval=0.01):
+        self.cameras = list(cameras)
+        self.handle_results = handle_results
+        self.reorder = reorder_ms / 1000.0
+        self.on_error = on_error
+        self.metrics = metrics or DISABLED
+        self.poll_interval = poll_interval
+        self.pipelines = {}
+        for camera in self.cameras:
+            self.pipelines[camera] = ScanPipeline(
+                lambda camera=camera: open_source(camera),
+                lambda frame, camera=camera: decode_frame(camera, frame),
+                None,
+                queue_size=queue_size,
+                drop_policy=drop_policy,
+                on_error=lambda message, camera=camera: self._error(camera, message),
+                metrics=self.metrics,
+                record=False,
+                name=f"scan-cam{camera}")
+        self.active = False
+        self.paused = False
+        self.frames = {}  # camera -> latest preview frame
+        self.seen = {}  # payload -> (captured_at, camera) of its latest delivery
+        self.last_counts = {}
+        self.last_rates_time = time.monotonic()
+        self._tracer = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self.active and any(pipeline.running for pipeline in self.pipelines.values())
+
+    @property
+    def tracer(self):
+        return self._tracer
+
+    @tracer.setter
+    def tracer(self, tracer):
+        self._tracer = tracer
+        for pipeline in self.pipelines.values():
+            pipeline.tracer = tracer
+
+    def _error(self, camera, message):
+        if self.on_error:
+            self.on_error(f"Camera {camera}: {message}")
+
+    def start(self):
+        """Start every camera that opens; False if none did"""
+        if self.active:
+            return True
+        for camera, pipeline in list(self.pipelines.items()):
+            if not pipeline.start():
+                del self.pipelines[camera]
+        if not self.pipelines:
+            return False
+        self.active = True
+        self._thread = threading.Thread(target=self._merge_loop, name="scan-merge", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, wait=False):
+        self.active = False
+        for pipeline in self.pipelines.values():
+            pipeline.stop(wait=wait)
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self.frames.clear()
+
+    def pause(self):
+        self.paused = True
+        for pipeline in self.pipelines.values():
+            pipeline.pause()
+
+    def resume(self):
+        for pipeline in self.pipelines.values():
+            pipeline.resume()
+        self.paused = False
+
+    def latest_preview(self):
+        """Grid of each camera's newest frame, as a (None, None, frame) preview item"""
+        updated = False
+        for camera, pipeline in self.pipelines.items():
+            item = pipeline.latest_preview()
+            if item is not None:
+                self.frames[camera] = item[2]
+                updated = True
+        if not updated:
+            return None
+        return None, None, tile_frames([self.frames[camera] for camera in self.cameras
+                                        if camera in self.frames])
+
+    def rates(self):
+        """Per camera: capture fps, decode fps and hit rate since the previous call"""
+        now = time.monotonic()
+        elapsed = max(now - self.last_rates_time, 1e-6)
+        rates = {}
+        for camera, pipeline in self.pipelines.items():
+            counts = (pipeline.captured, pipeline.decoded, pipeline.hits)
+            captured, decoded, hits = [count - last for count, last in
+                                       zip(counts, self.last_counts.get(camera, counts))]
+            self.last_counts[camera] = counts
+            rates[camera] = (captured / elapsed, decoded / elapsed,
+                             hits / decoded if decoded else 0.0)
+        self.last_rates_time = now
+        return rates
+
+    def _merge_loop(self):
+        pending = []  # heap of (captured_at, seq, camera, frame_id, frame, results)
+        sequence = itertools.count()
+        while True:
+            running = self.running
+            for camera, pipeline in self.pipelines.items():
+                for frame_id, captured_at, frame, results in pipeline.results.drain():
+                    heapq.heappush(pending, (captured_at, next(sequence), camera,
+                                             frame_id, frame, results))
+            if self.paused:
+                pending = []
+            # Everything captured before the slowest live camera's last decode is final
+            watermark = min([pipeline.decoded_until for pipeline in self.pipelines.values()
+                             if pipeline.running] or [float("inf")])
+            cutoff = max(watermark, time.monotonic() - self.reorder)
+            while pending and (pending[0][0] <= cutoff or not running):
+                captured_at, _, camera, frame_id, frame, results = heapq.heappop(pending)
+                if self.paused:
+                    pending = []
+                    break
+                self._record(camera, frame_id, captured_at, frame, results)
+            if not running and not pending:
+                break
+            time.sleep(self.poll_interval)
+        self.active = False
+
+    def _cross_camera_repeats(self, camera, captured_at, results):
+        """Drop results another camera delivered within the reorder window"""
+        for payload in [payload for payload, (seen_at, _) in self.seen.items()
+                        if captured_at - seen_at > self.reorder]:
+            del self.seen[payload]
+        kept = []
+        for result in results:
+            payload = getattr(result, "data", result)
+            seen_at, seen_by = self.seen.get(payload, (captured_at, camera))
+            if seen_by == camera or abs(captured_at - seen_at) > self.reorder:
+                self.seen[payload] = (captured_at, camera)
+                kept.append(result)
+            else:
+                # Still the first camera's code while the others keep seeing it
+                self.seen[payload] = (max(seen_at, captured_at), seen_by)
+        return kept
+
+    def _record(self, camera, frame_id, captured_at, frame, results):
+        if results:
+            results = self._cross_camera_repeats(camera, captured_at, results)
+            if not results:
+                return
+        start = time.perf_counter()
+        try:
+            self.handle_results(frame, results, camera)
+        except Exception as e:
+            self._error(camera, f"Failed to record scan: {str(e)}")
+            return
+        end = time.perf_counter()
+        self.metrics.observe("record", end - start)
+        if self._tracer is not None:
+            self._tracer.stage(frame_id, "record", start, end)
+        self.metrics.observe("frame_to_record", time.monotonic() - captured_at)
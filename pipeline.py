@@ -0,0 +1,313 @@
+import queue
+import threading
+import time
+
+from metrics import DISABLED
+
+# Drop policies for the bounded queues between pipeline stages
+DROP_OLDEST = "drop_oldest"   # evict the oldest queued item to make room
+DROP_NEWEST = "drop_newest"   # discard the incoming item when full
+BLOCK = "block"               # wait for room (back-pressure)
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class BoundedQueue:
+    """Fixed-size queue between two pipeline stages with a drop policy"""
+
+    def __init__(self, maxsize=1, drop_policy=DROP_OLDEST):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._lock = threading.Lock()
+
+    def put(self, item, timeout=None):
+        """Add an item, applying the drop policy when the queue is full.
+
+        Returns False if the item itself was discarded.
+        """
+        if self.drop_policy == BLOCK:
+            try:
+                self._queue.put(item, timeout=timeout)
+                return True
+            except queue.Full:
+                self.dropped += 1
+                return False
+
+        with self._lock:
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                pass
+            self.dropped += 1
+            if self.drop_policy == DROP_NEWEST:
+                return False
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(item)
+            return True
+
+    def get(self, timeout=None):
+        """Take the next item, or None if nothing arrived before the timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_latest(self):
+        """Drain the queue and return only the newest item (or None)"""
+        item = None
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return item
+
+    def drain(self):
+        """Take every queued item, oldest first"""
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def clear(self):
+        self.get_latest()
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+class ScanPipeline:
+    """Capture -> decode -> record pipeline running on worker threads.
+
+    * the capture thread reads frames from ``open_source()`` and keeps only
+      the newest ones in the decode queue and the preview slot
+    * the decode thread runs ``decode_frame(frame)`` and forwards frames that
+      produced results
+    * the record thread calls ``handle_results(frame, results)`` so slow
+      sinks never hold up capture or decode; with ``record=False`` there is
+      no record thread and the caller drains ``results`` itself (see
+      ``multicam.MultiCameraScan``)
+
+    With a ``decoder`` (``process_decode.ProcessDecoder``) the capture
+    thread hands frames to its worker processes instead of the decode
+    queue, and the decode thread only collects their results, which are
+    ``Decoded`` tuples rather than whatever ``decode_frame`` returns.
+
+    ``captured``, ``decoded`` and ``hits`` count frames read, frames
+    decoded and frames with codes whether or not metrics are on;
+    ``decoded_until`` is the capture time of the last frame decoded. Stage
+    latencies and frame counts also go to ``metrics`` (off by default);
+    a ``tracer`` (e.g. ``profiling.Profiler``) additionally gets every
+    stage of every frame through ``tracer.stage(frame_id, name, start, end)``.
+
+    Nothing in here touches Tk; the GUI polls ``latest_preview()`` from
+    ``root.after`` and marshals its own widget updates.
+
+    ``pause()`` keeps the source open and reading (so the camera doesn't
+    have to be reopened and re-settle exposure) but drops the frames until
+    ``resume()``.
+    """
+
+    def __init__(self, open_source, decode_frame, handle_results,
+                 queue_size=1, drop_policy=DROP_OLDEST, on_error=None, metrics=None,
+                 record=True, name="scan", decoder=None):
+        self.open_source = open_source
+        self.decode_frame = decode_frame
+        self.handle_results = handle_results
+        self.on_error = on_error
+        self.metrics = metrics or DISABLED
+        self.tracer = None
+        self.record = record
+        self.name = name
+        self.decoder = decoder
+        self.frames = BoundedQueue(queue_size, drop_policy)
+        self.results = BoundedQueue(max(queue_size, 8), drop_policy)
+        self.preview = BoundedQueue(1, DROP_OLDEST)
+        self.running = False
+        self.paused = False
+        self.source = None
+        self.frame_id = 0
+        self.captured = 0
+        self.decoded = 0
+        self.hits = 0
+        self.decoded_until = 0.0
+        self._threads = []
+
+    def start(self):
+        """Open the frame source and start the stage threads"""
+        if self.running:
+            return True
+        self.source = self.open_source()
+        if self.source is None or not self.source.isOpened():
+            if self.source is not None:
+                self.source.release()
+            self.source = None
+            if self.on_error:
+                self.on_error("Failed to access the camera")
+            return False
+
+        self.running = True
+        if self.decoder is not None:
+            self.decoder.discard()
+            self.decoder.start()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name=f"{self.name}-capture", daemon=True),
+            threading.Thread(target=self._decode_loop, name=f"{self.name}-decode", daemon=True),
+        ]
+        if self.record:
+            self._threads.append(threading.Thread(target=self._record_loop,
+                                                  name=f"{self.name}-record", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return True
+
+    def stop(self, wait=False):
+        """Stop all stages; optionally wait for the threads to exit"""
+        self.running = False
+        if wait:
+            current = threading.current_thread()
+            for thread in self._threads:
+                if thread is not current:
+                    thread.join(timeout=2)
+        self.frames.clear()
+        self.preview.clear()
+
+    def pause(self):
+        """Stop decoding and previewing without releasing the source"""
+        self.paused = True
+
+    def resume(self):
+        """Continue with fresh frames after ``pause()``"""
+        self.frames.clear()
+        self.preview.clear()
+        self.results.clear()
+        self.paused = False
+
+    def latest_preview(self):
+        """Newest captured frame for display, or None if nothing new arrived"""
+        return self.preview.get_latest()
+
+    def _capture_loop(self):
+        source = self.source
+        metrics = self.metrics
+        try:
+            while self.running:
+                start = time.perf_counter()
+                ret, frame = source.read()
+                if not ret:
+                    if getattr(source, "exhausted", False):
+                        break
+                    time.sleep(0.005)
+                    continue
+                end = time.perf_counter()
+                metrics.observe("capture", end - start)
+                metrics.inc("frames_captured")
+                self.captured += 1
+                if self.paused:
+                    continue
+                self.frame_id += 1
+                if self.tracer is not None:
+                    self.tracer.stage(self.frame_id, "capture", start, end)
+                item = (self.frame_id, time.monotonic(), frame)
+                self.preview.put(item)
+                if self.decoder is not None:
+                    if not self.decoder.submit(*item):
+                        metrics.inc("frames_dropped")
+                    continue
+                dropped = self.frames.dropped
+                self.frames.put(item, timeout=0.5)
+                if self.frames.dropped != dropped:
+                    metrics.inc("frames_dropped")
+        finally:
+            self.running = False
+            source.release()
+
+    def _decode_loop(self):
+        if self.decoder is not None:
+            return self._collect_loop()
+        metrics = self.metrics
+        while self.running:
+            item = self.frames.get(timeout=0.1)
+            if item is None:
+                continue
+            if self.paused:
+                continue
+            frame_id, captured_at, frame = item
+            start = time.perf_counter()
+            try:
+                results = self.decode_frame(frame)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(f"Decode failed: {str(e)}")
+                continue
+            finally:
+                self.decoded_until = captured_at
+            end = time.perf_counter()
+            metrics.observe("decode", end - start)
+            if self.tracer is not None:
+                self.tracer.stage(frame_id, "decode", start, end)
+            metrics.inc("frames_decoded")
+            self.decoded += 1
+            if results:
+                metrics.inc("frames_with_codes")
+                self.hits += 1
+                self.results.put((frame_id, captured_at, frame, results), timeout=0.5)
+
+    def _collect_loop(self):
+        """Decode stage when a process decoder does the work"""
+        metrics = self.metrics
+        decoder = self.decoder
+        errors = decoder.errors
+        while self.running:
+            # collect() also restarts workers that died (and drops their frames)
+            finished = decoder.collect(timeout=0.1)
+            if decoder.errors != errors:
+                errors = decoder.errors
+                if self.on_error:
+                    self.on_error(f"Decode failed: {decoder.last_error}")
+            if not decoder.alive():
+                if self.on_error:
+                    self.on_error("Decoder processes exited")
+                self.running = False
+                break
+            for frame_id, captured_at, frame, results, start, end in finished:
+                self.decoded_until = captured_at
+                if self.paused:
+                    continue
+                metrics.observe("decode", end - start)
+                if self.tracer is not None:
+                    self.tracer.stage(frame_id, "decode", start, end)
+                metrics.inc("frames_decoded")
+                self.decoded += 1
+                if results:
+                    metrics.inc("frames_with_codes")
+                    self.hits += 1
+                    self.results.put((frame_id, captured_at, frame, results), timeout=0.5)
+
+    def _record_loop(self):
+        while self.running or self.results.qsize():
+            item = self.results.get(timeout=0.1)
+            if item is None:
+                continue
+            if self.paused:
+                continue
+            frame_id, captured_at, frame, results = item
+            start = time.perf_counter()
+            try:
+                self.handle_results(frame, results)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(f"Failed to record scan: {str(e)}")
+                continue
+            end = time.perf_counter()
+            self.metrics.observe("record", end - start)
+            if self.tracer is not None:
+                self.tracer.stage(frame_id, "record", start, end)
+            self.metrics.observe("frame_to_record", time.monotonic() - captured_at)
@@ -0,0 +1,79 @@
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class PreviewRenderer:
+    """Draws camera frames into a Tk label at a fixed display rate.
+
+    Each frame is resized once to fit the label (keeping its aspect ratio),
+    converted straight to RGB and pasted into one persistent
+    ``ImageTk.PhotoImage``; a new PhotoImage is only created when the
+    display size changes. The caller schedules ``render`` every ``interval_ms``
+    (``1000 / fps``), independently of how fast frames are captured or
+    decoded; frames in between are never converted. Must be used
+    from the Tk thread.
+    """
+
+    # Ignore label size changes smaller than this to avoid resize feedback
+    SIZE_SLACK = 4
+
+    def __init__(self, label, fps=15):
+        self.label = label
+        self.fps = fps
+        self.photo = None
+        self.size = None
+        self.rendered = 0
+
+    @property
+    def interval_ms(self):
+        """Delay between preview ticks for ``root.after``"""
+        return max(1, int(1000 / self.fps))
+
+    def display_size(self, width, height):
+        """Largest size with the frame's aspect ratio that fits the label"""
+        label_width = self.label.winfo_width()
+        label_height = self.label.winfo_height()
+        if label_width <= 1 or label_height <= 1:
+            return width, height  # Not laid out yet
+        scale = min(label_width / width, label_height / height)
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        if self.size and abs(size[0] - self.size[0]) <= self.SIZE_SLACK and \
+                abs(size[1] - self.size[1]) <= self.SIZE_SLACK:
+            return self.size
+        return size
+
+    def render(self, frame, polygons=()):
+        """Show a BGR frame, outlining ``polygons`` (full-frame coordinates)"""
+        height, width = frame.shape[:2]
+        size = self.display_size(width, height)
+        if size != (width, height):
+            interpolation = cv2.INTER_AREA if size[0] < width else cv2.INTER_LINEAR
+            image = cv2.resize(frame, size, interpolation=interpolation)
+        else:
+            image = frame.copy() if polygons else frame
+        if polygons:
+            self.draw_polygons(image, polygons, size[0] / width, size[1] / height)
+        image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+        if self.photo is None or size != self.size:
+            self.photo = ImageTk.PhotoImage(image=image)
+            self.size = size
+            self.label.configure(image=self.photo)
+        else:
+            self.photo.paste(image)
+        self.rendered += 1
+
+    @staticmethod
+    def draw_polygons(image, polygons, scale_x, scale_y):
+        for points in polygons:
+            points = np.array(points, dtype=np.float32)
+            if len(points) > 4:
+                points = cv2.convexHull(points)
+            points = points.reshape(-1, 2) * (scale_x, scale_y)
+            cv2.polylines(image, [points.astype(np.int32)], True, (0, 255, 0), 2)
+
+    def clear(self):
+        self.label.configure(image='')
+        self.photo = None
+        self.size = None
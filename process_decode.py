@@ -0,0 +1,264 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from decoding import DecodeLadder, create_backend
+
+
+class FrameRing:
+    """``slots`` fixed-size frame buffers in one shared-memory block"""
+
+    def __init__(self, slots, slot_bytes):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.free = deque(range(slots))
+        self.in_use = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, frame):
+        """Copy ``frame`` into a free slot; returns the slot, or None when all are taken"""
+        if not self.free:
+            return None
+        slot = self.free.popleft()
+        view = np.ndarray(frame.shape, frame.dtype, buffer=self.shm.buf,
+                          offset=slot * self.slot_bytes)
+        view[...] = frame
+        del view
+        self.in_use += 1
+        return slot
+
+    def release(self, slot):
+        self.free.append(slot)
+        self.in_use -= 1
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def decode_worker(tasks, results, symbols, scales, upscale, backend_name):
+    """Worker process: decode frames straight out of the shared ring until a None task"""
+    ladder = DecodeLadder(scales=scales, upscale=upscale, symbols=symbols,
+                          backend=create_backend(backend_name, symbols) if backend_name else None)
+    attached = {}
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        generation, frame_id, name, slot, offset, shape, dtype = task
+        shm = attached.get(name)
+        if shm is None:
+            try:
+                shm = attached[name] = shared_memory.SharedMemory(name=name)
+            except FileNotFoundError:
+                # A ring retired after ``discard``; the result would be ignored anyway
+                results.put((generation, frame_id, [], 0.0, 0.0, "frame ring is gone"))
+                continue
+        frame = np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+        start = time.perf_counter()
+        try:
+            found, error = ladder.decode(frame), None
+        except Exception as e:
+            found, error = [], str(e)
+        end = time.perf_counter()
+        del frame
+        results.put((generation, frame_id, found, start, end, error))
+    for shm in attached.values():
+        shm.close()
+
+
+class ProcessDecoder:
+    """Decode frames in worker processes, out of the GIL's way.
+
+    ``submit`` copies a frame into a slot of a shared-memory ``FrameRing``
+    and queues only its location; ``workers`` processes decode it there
+    without copying and send back the small ``Decoded`` results. ``collect``
+    returns finished frames in submission order as
+    ``(frame_id, captured_at, frame, results, start, end)``; ``frame`` is the
+    caller's own array, so slots are free again as soon as a result arrives.
+    When every slot is busy ``submit`` returns False and the frame is
+    dropped, like a full ``BoundedQueue``.
+
+    Each worker has its own task queue, so every in-flight frame has a
+    known owner: if a worker dies, its frames are dropped (their slots
+    freed, the failure counted in ``errors``) and it is restarted, up to
+    ``max_restarts`` times in total.
+
+    The ring is sized from the first frame (and rebuilt if a larger one
+    arrives). ``discard`` forgets in-flight frames when a new scan starts;
+    the pool itself stays up until ``close``. Results carry full-frame
+    polygons, so callers can outline codes as with in-thread decoding.
+    """
+
+    def __init__(self, workers=None, slots=None, symbols=("QRCODE",), scales=(0.5, 1.0),
+                 upscale=2.0, backend=None, start_method="spawn", max_restarts=5):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.slots = slots or self.workers * 2
+        self.symbols = tuple(symbols)
+        self.scales = tuple(scales)
+        self.upscale = upscale
+        self.backend = backend  # backend name, or None for the default
+        self.context = multiprocessing.get_context(start_method)
+        self.results = self.context.Queue()
+        self.processes = []
+        self.task_queues = []  # one per worker
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self.ring = None
+        self.retired = []  # smaller rings still holding in-flight frames
+        self.in_flight = {}  # frame_id -> (ring, slot, captured_at, frame, worker)
+        self.done = {}  # finished frames waiting for an earlier one
+        self.generation = 0
+        self.lock = threading.Lock()  # submit (capture thread) vs collect/discard
+        self.errors = 0
+        self.last_error = None
+
+    def start(self):
+        if self.processes:
+            return
+        self.processes = [None] * self.workers
+        self.task_queues = [None] * self.workers
+        for i in range(self.workers):
+            self._spawn(i)
+
+    def _spawn(self, i):
+        tasks = self.context.Queue()
+        args = (tasks, self.results, self.symbols, self.scales, self.upscale, self.backend)
+        process = self.context.Process(target=decode_worker, args=args,
+                                       name=f"decode-worker-{i}", daemon=True)
+        process.start()
+        self.processes[i] = process
+        self.task_queues[i] = tasks
+
+    def check_workers(self):
+        """Drop the frames of workers that died and restart them"""
+        for i, process in enumerate(self.processes):
+            if process is None or process.is_alive():
+                continue
+            with self.lock:
+                lost = [frame_id for frame_id, entry in self.in_flight.items() if entry[4] == i]
+                for frame_id in lost:
+                    ring, slot = self.in_flight.pop(frame_id)[:2]
+                    ring.release(slot)
+                self.errors += 1
+                self.last_error = (f"decode worker {i} exited with code {process.exitcode}; "
+                                   f"{len(lost)} frame(s) dropped")
+            self.task_queues[i].cancel_join_thread()
+            self.task_queues[i].close()
+            if self.restarts < self.max_restarts:
+                self.restarts += 1
+                self._spawn(i)
+            else:
+                self.processes[i] = None
+
+    def submit(self, frame_id, captured_at, frame):
+        """Hand a frame to the pool; False if the ring is full and it was dropped"""
+        with self.lock:
+            if self.ring is None or frame.nbytes > self.ring.slot_bytes:
+                self._new_ring(frame.nbytes)
+            # The live worker with the fewest frames in flight
+            load = {i: 0 for i, process in enumerate(self.processes) if process is not None}
+            if not load:
+                return False
+            slot = self.ring.write(frame)
+            if slot is None:
+                return False
+            for entry in self.in_flight.values():
+                if entry[4] in load:
+                    load[entry[4]] += 1
+            worker = min(load, key=load.get)
+            self.in_flight[frame_id] = (self.ring, slot, captured_at, frame, worker)
+            task = (self.generation, frame_id, self.ring.name, slot,
+                    slot * self.ring.slot_bytes, frame.shape, frame.dtype.str)
+            tasks = self.task_queues[worker]
+        tasks.put(task)
+        return True
+
+    def _new_ring(self, slot_bytes):
+        if self.ring is not None:
+            self.retired.append(self.ring)
+        self.ring = FrameRing(self.slots, slot_bytes)
+
+    def collect(self, timeout=0.1):
+        """Frames decoded since the last call, oldest first"""
+        self.check_workers()
+        try:
+            messages = [self.results.get(timeout=timeout)]
+        except queue.Empty:
+            messages = []
+        while True:
+            try:
+                messages.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+
+        with self.lock:
+            for generation, frame_id, found, start, end, error in messages:
+                entry = self.in_flight.pop(frame_id, None) \
+                    if generation == self.generation else None
+                if entry is None:
+                    continue  # From before ``discard``, or dropped with a dead worker
+                ring, slot, captured_at, frame, _ = entry
+                ring.release(slot)
+                if error:
+                    self.errors += 1
+                    self.last_error = error
+                self.done[frame_id] = (frame_id, captured_at, frame, found, start, end)
+            self._close_retired()
+
+            # Workers finish out of order; hold results back until earlier frames are in
+            oldest = min(self.in_flight, default=None)
+            ready = sorted(frame_id for frame_id in self.done
+                           if oldest is None or frame_id < oldest)
+            return [self.done.pop(frame_id) for frame_id in ready]
+
+    def pending(self):
+        return len(self.in_flight)
+
+    def alive(self):
+        """Number of worker processes still running"""
+        return sum(process is not None and process.is_alive() for process in self.processes)
+
+    def discard(self):
+        """Forget in-flight frames (e.g. when a new scan restarts frame ids)"""
+        with self.lock:
+            self.generation += 1
+            for ring, slot, _, _, _ in self.in_flight.values():
+                ring.release(slot)
+            self.in_flight.clear()
+            self.done.clear()
+            self._close_retired()
+
+    def _close_retired(self):
+        for ring in [ring for ring in self.retired if not ring.in_use]:
+            self.retired.remove(ring)
+            ring.close()
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        for process, tasks in zip(self.processes, self.task_queues):
+            if process is not None:
+                tasks.put(None)
+        for process in self.processes:
+            if process is None:
+                continue
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.task_queues = []
+        self.discard()
+        for ring in self.retired + ([self.ring] if self.ring is not None else []):
+            ring.close()
+        self.retired = []
+        self.ring = None
@@ -0,0 +1,198 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+
+class Profiler:
+    """Time-boxed profiling session written to a timestamped folder.
+
+    While active:
+
+    * functions wrapped with ``profiled`` run under cProfile (one profile
+      per thread, merged into ``profile.pstats`` / ``profile.txt``)
+    * tracemalloc snapshots are taken every ``snapshot_interval`` seconds;
+      ``memory-NN.txt`` lists the top allocation sites and their growth
+      since the first snapshot
+    * ``stage(frame_id, name, start, end)`` events are collected into
+      ``trace.json`` (Chrome trace format; open in Perfetto or
+      chrome://tracing)
+
+    ``start`` opens a session that stops by itself after ``duration``
+    seconds (None = until ``stop``); ``on_done(path)`` is then called from
+    the stopping thread. Nothing Tk-specific, so headless tools use it too.
+    """
+
+    def __init__(self, directory="profiles", duration=60.0, snapshot_interval=10.0,
+                 max_events=200000, on_done=None):
+        self.directory = directory
+        self.duration = duration
+        self.snapshot_interval = snapshot_interval
+        self.max_events = max_events
+        self.on_done = on_done
+        self.active = False
+        self.path = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.generation = 0
+        self.profiles = []
+        self.in_flight = 0
+        self.events = []
+        self.thread_names = {}
+        self.started = 0.0
+        self.first_snapshot = None
+        self.snapshots = 0
+        self.started_tracemalloc = False
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self, duration=None):
+        """Begin a session; returns the output folder"""
+        with self.lock:
+            if self.active:
+                return self.path
+            self.path = os.path.join(self.directory, datetime.now().strftime('%Y%m%d-%H%M%S'))
+            os.makedirs(self.path, exist_ok=True)
+            self.generation += 1
+            self.profiles = []
+            self.events = []
+            self.thread_names = {}
+            self.snapshots = 0
+            self.first_snapshot = None
+            self.started = time.perf_counter()
+            self.stopping.clear()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+                self.started_tracemalloc = True
+            self.active = True
+
+        duration = self.duration if duration is None else duration
+        self.threads = [threading.Thread(target=self._snapshot_loop, name="profile-memory",
+                                         daemon=True)]
+        if duration:
+            self.threads.append(threading.Thread(target=self._stop_after, args=(duration,),
+                                                 name="profile-timer", daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self.path
+
+    def _stop_after(self, duration):
+        if not self.stopping.wait(duration):
+            self.stop()
+
+    def stop(self):
+        """End the session and write the results; returns the folder (None if idle)"""
+        with self.lock:
+            if not self.active:
+                return None
+            self.active = False
+        self.stopping.set()
+        current = threading.current_thread()
+        for thread in self.threads:
+            if thread is not current:
+                thread.join(timeout=5)
+        # Let wrapped calls that are still running finish with their profiler
+        deadline = time.monotonic() + 2.0
+        while self.in_flight and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self._snapshot()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+        self._write_profile()
+        self._write_trace()
+        if self.on_done:
+            self.on_done(self.path)
+        return self.path
+
+    def profiled(self, fn):
+        """Wrap ``fn`` so calls made during a session are profiled"""
+        def wrapper(*args, **kwargs):
+            if not self.active:
+                return fn(*args, **kwargs)
+            local = self.local
+            if getattr(local, "depth", 0):
+                return fn(*args, **kwargs)  # Already inside a profiled call
+            if getattr(local, "generation", None) != self.generation:
+                local.profile = cProfile.Profile()
+                local.generation = self.generation
+                with self.lock:
+                    self.profiles.append(local.profile)
+            try:
+                local.profile.enable()
+            except ValueError:
+                return fn(*args, **kwargs)  # Another profiler owns this thread
+            local.depth = 1
+            with self.lock:
+                self.in_flight += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                local.profile.disable()
+                local.depth = 0
+                with self.lock:
+                    self.in_flight -= 1
+
+        wrapper.__name__ = getattr(fn, "__name__", "profiled")
+        wrapper.__doc__ = getattr(fn, "__doc__", None)
+        return wrapper
+
+    def stage(self, frame_id, name, start, end):
+        """Record one stage of one frame (``time.perf_counter`` start/end)"""
+        if not self.active or len(self.events) >= self.max_events:
+            return
+        thread = threading.current_thread()
+        self.thread_names[thread.ident] = thread.name
+        self.events.append({'name': name, 'ph': 'X', 'pid': 1, 'tid': thread.ident,
+                            'ts': (start - self.started) * 1e6,
+                            'dur': (end - start) * 1e6,
+                            'args': {'frame': frame_id}})
+
+    def _snapshot_loop(self):
+        self._snapshot()
+        while not self.stopping.wait(self.snapshot_interval):
+            self._snapshot()
+
+    def _snapshot(self):
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"Traced memory: {current / 1024:.0f} KiB (peak {peak / 1024:.0f} KiB)",
+                 "", "Top allocation sites:"]
+        lines += [f"  {stat}" for stat in snapshot.statistics("lineno")[:25]]
+        if self.first_snapshot is None:
+            self.first_snapshot = snapshot
+        else:
+            lines += ["", "Growth since the first snapshot:"]
+            lines += [f"  {stat}" for stat in
+                      snapshot.compare_to(self.first_snapshot, "lineno")[:25]]
+        with open(os.path.join(self.path, f"memory-{self.snapshots:02d}.txt"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+        self.snapshots += 1
+
+    def _write_profile(self):
+        profiles = [profile for profile in self.profiles if profile.getstats()]
+        if not profiles:
+            return
+        stats = pstats.Stats(*profiles)
+        stats.dump_stats(os.path.join(self.path, "profile.pstats"))
+        text = io.StringIO()
+        pstats.Stats(*profiles, stream=text).sort_stats("cumulative").print_stats(60)
+        with open(os.path.join(self.path, "profile.txt"), "w") as f:
+            f.write(text.getvalue())
+
+    def _write_trace(self):
+        names = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': ident,
+                  'args': {'name': name}} for ident, name in self.thread_names.items()]
+        with open(os.path.join(self.path, "trace.json"), "w") as f:
+            json.dump({'traceEvents': names + self.events, 'displayTimeUnit': 'ms'}, f)
@@ -1,22 +1,39 @@
+import startup
+startup.timer.install()
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-import cv2
-from pyzbar.pyzbar import decode
-import csv
-import xml.etree.ElementTree as ET
-import pandas as pd
+from tkinter import ttk, messagebox, filedialog, simpledialog
 from datetime import datetime
 import os
 import threading
-from PIL import Image, ImageTk
-import numpy as np
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
+import argparse
 import pickle
-import json
-import openpyxl
+from collections import deque
+from pipeline import ScanPipeline, DROP_OLDEST
+from multicam import MultiCameraScan
+from process_decode import ProcessDecoder
+from frame_sources import open_source
+from preview import PreviewRenderer
+from cameras import load_cached_cameras, discover_async
+from decoding import RoiTracker, DecodeLadder, BACKENDS, calibrate, create_backend, format_report
+import sinks
+from journal import ScanJournal, Exporter, export_name
+from dedupe import DuplicateIndex
+from history import ScanHistory, time_of_day
+from metrics import Metrics, MetricsExporter, RateTracker
+from profiling import Profiler
+import time
+
+
+def import_google_client():
+    """Import the Google API client stack on first use; only Sheets needs it"""
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+    from google.auth.transport.requests import Request
+    return InstalledAppFlow, build, Request
+
+
+ALL_CAMERAS = "All cameras"
+
 
 class EnhancedQRScannerApp:
     def __init__(self, root):
@@ -33,21 +50,103 @@ class EnhancedQRScannerApp:
         self.spreadsheet_path = None
         self.is_scanning = False
         self.current_camera = 0
+        self.scan_cameras = None  # several cameras scanned at once, e.g. [0, 2]
+        self.reorder_ms = 500  # longest a merged result waits for slower cameras
+        self.camera_decoders = {}  # camera -> (RoiTracker, DecodeLadder) while scanning several
+        self.calibration_camera = None
         self.available_cameras = self.get_available_cameras()
-        self.last_scan = None
         self.duplicate_check = tk.BooleanVar(value=True)
+        self.duplicate_window = tk.IntVar(value=0)  # minutes; 0 = never allow again
+        self.duplicate_capacity = None
+        self.duplicate_index = DuplicateIndex(capacity=self.duplicate_capacity)
         self.auto_save = tk.BooleanVar(value=True)
+        self.continuous_mode = tk.BooleanVar(value=False)
+        self.multi_code = tk.BooleanVar(value=False)  # record every code in a frame together
+        self.toast_ms = 1500
+        self.toast_job = None
         self.frozen_frame = None
         self.current_sl_no = 1
         self.google_sheets_enabled = tk.BooleanVar(value=False)
         self.sheets_service = None
         self.spreadsheet_id = None
+        self.sheets_batch_size = 50
+        self.sheets_flush_interval = 2.0
+        self.outbox_dir = "outbox"
+        self.pipeline = None
+        self.journal_path = "scans.db"
+        self.journal = ScanJournal(self.journal_path)
+        self.exporters = {}  # (file_format, target) -> Exporter tailing the journal
+        self.sink_lock = threading.Lock()
+        self.excel_checkpoint_rows = 500
+        self.excel_checkpoint_seconds = 30.0
+        self.csv_flush_policy = tk.StringVar(value=sinks.FLUSH_EVERY_ROW)
+        self.file_format_choice = tk.StringVar(value="CSV")
+        self.csv_flush_rows = 50
+        self.csv_flush_ms = 500
+        self.frame_source = None  # camera index, video, image folder or "synthetic[:opts]"
+        self.queue_size = 1
+        self.decode_processes = 0  # >0: decode in worker processes fed through shared memory
+        self.process_decoder = None
+        self.drop_policy = DROP_OLDEST
+        self.preview_fps = tk.IntVar(value=15)  # display rate, independent of decoding
+        self.history_capacity = 1000  # scans kept in memory; older ones are paged from the journal
+        self.history_window = 200
+        self.journaled = deque(maxlen=self.history_capacity)  # (recorded_at, first journal id)
+        self.metrics = Metrics(enabled=False)
+        self.metrics_enabled = tk.BooleanVar(value=False)
+        self.metrics_dir = "metrics"
+        self.metrics_interval = 10.0  # seconds between metrics.json/metrics.prom exports
+        self.metrics_exporter = None
+        self.stats_job = None
+        self.rates = RateTracker(self.metrics)
+        self.profiling_enabled = tk.BooleanVar(value=False)
+        self.profiler = Profiler(on_done=self.profiling_done)
+        # Route the scan path through the profiler; a plain call unless a session is running
+        for name in ("scan_qr", "decode_frame", "decode_camera_frame", "handle_decoded",
+                     "process_codes", "save_rows", "refresh_preview"):
+            setattr(self, name, self.profiler.profiled(getattr(self, name)))
+        self.roi_tracker = RoiTracker()
+        self.decode_ladder = DecodeLadder(metrics=self.metrics)
+        self.decoder_choice = tk.StringVar(value="Auto")
+        self.calibration_frames = 30
+        self.calibration_target = 0.9
+        self.calibration_min_hits = 5  # a backend is only chosen once codes were really in view
+        self.calibration_attempts = 4  # runs per scan before settling on the default backend
+        self.calibration_backoff = 30  # frames skipped before the first retry, doubled per retry
+        self.calibration_sample = None
+        self.calibration_skip = 0
+        self.calibration_runs = 0
+        self.calibration_generation = 0  # bumped to discard a run still in progress
+        self.calibrated = False
         
         # Google Sheets API scope
         self.SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
         
         self.setup_ui()
+        self.mirror_settings()
+        self.refresh_cameras()
+        self.resume_exports()
         
+    def mirror_settings(self):
+        """Keep plain copies of the settings the worker threads read.
+
+        Tk may only be called from the main thread, so the record thread
+        reads ``self.settings`` instead of the variables; the traces below
+        update it on the main thread whenever a setting changes.
+        """
+        self.settings = {}
+        variables = {'duplicate_check': self.duplicate_check,
+                     'auto_save': self.auto_save,
+                     'continuous_mode': self.continuous_mode,
+                     'multi_code': self.multi_code,
+                     'google_sheets_enabled': self.google_sheets_enabled,
+                     'csv_flush_policy': self.csv_flush_policy,
+                     'file_format': self.file_format_choice}
+        for name, variable in variables.items():
+            self.settings[name] = variable.get()
+            variable.trace_add("write", lambda *args, name=name, variable=variable:
+                               self.settings.__setitem__(name, variable.get()))
+
     def setup_ui(self):
         # Main container
         self.main_container = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
@@ -59,12 +158,16 @@ class EnhancedQRScannerApp:
         # Right panel setup
         self.setup_right_panel()
         
-        # Scan confirmation dialog
+        # Scan confirmation dialog and continuous-mode toast
         self.setup_confirmation_dialog()
+        self.setup_toast()
         
-        # Status bar
-        self.status_bar = ttk.Label(self.root, text="Ready", relief=tk.SUNKEN)
-        self.status_bar.pack(fill=tk.X, side=tk.BOTTOM, padx=5, pady=2)
+        # Status bar, with live pipeline rates on the right when metrics are on
+        self.status_frame = ttk.Frame(self.root)
+        self.status_frame.pack(fill=tk.X, side=tk.BOTTOM, padx=5, pady=2)
+        self.stats_bar = ttk.Label(self.status_frame, text="", relief=tk.SUNKEN)
+        self.status_bar = ttk.Label(self.status_frame, text="Ready", relief=tk.SUNKEN)
+        self.status_bar.pack(fill=tk.X, side=tk.LEFT, expand=True)
         
     def setup_left_panel(self):
         self.left_panel = ttk.Frame(self.main_container)
@@ -76,14 +179,15 @@ class EnhancedQRScannerApp:
         
         self.video_label = ttk.Label(self.camera_frame)
         self.video_label.pack(fill=tk.BOTH, expand=True)
+        self.preview = PreviewRenderer(self.video_label, fps=self.preview_fps.get())
         
         # Camera controls
         self.controls_frame = ttk.Frame(self.left_panel)
         self.controls_frame.pack(fill=tk.X, padx=5, pady=5)
         
         self.camera_combo = ttk.Combobox(self.controls_frame, 
-                                       values=[f"Camera {i}" for i in self.available_cameras])
-        self.camera_combo.set("Camera 0")
+                                       values=self.camera_choices())
+        self.camera_combo.set(f"Camera {self.available_cameras[0]}")
         self.camera_combo.pack(side=tk.LEFT, padx=5)
         
         self.scan_button = ttk.Button(self.controls_frame, 
@@ -108,10 +212,42 @@ class EnhancedQRScannerApp:
                        text="Check for duplicates", 
                        variable=self.duplicate_check).pack(anchor=tk.W, padx=5, pady=2)
         
+        window_frame = ttk.Frame(self.settings_frame)
+        window_frame.pack(anchor=tk.W, padx=5, pady=2)
+        ttk.Label(window_frame, text="Allow repeat after (min, 0 = never):").pack(side=tk.LEFT)
+        ttk.Spinbox(window_frame, from_=0, to=1440, width=5,
+                    textvariable=self.duplicate_window).pack(side=tk.LEFT, padx=2)
+        self.duplicate_window.trace_add("write", self.change_duplicate_window)
+        
+        fps_frame = ttk.Frame(self.settings_frame)
+        fps_frame.pack(anchor=tk.W, padx=5, pady=2)
+        ttk.Label(fps_frame, text="Preview FPS:").pack(side=tk.LEFT)
+        ttk.Spinbox(fps_frame, from_=1, to=60, width=5,
+                    textvariable=self.preview_fps).pack(side=tk.LEFT, padx=2)
+        self.preview_fps.trace_add("write", self.change_preview_fps)
+        
         ttk.Checkbutton(self.settings_frame, 
                        text="Auto-save", 
                        variable=self.auto_save).pack(anchor=tk.W, padx=5, pady=2)
         
+        ttk.Checkbutton(self.settings_frame,
+                       text="Continuous mode (no confirmation)",
+                       variable=self.continuous_mode).pack(anchor=tk.W, padx=5, pady=2)
+        
+        ttk.Checkbutton(self.settings_frame,
+                       text="Multi-code mode (all codes in a frame)",
+                       variable=self.multi_code).pack(anchor=tk.W, padx=5, pady=2)
+        
+        ttk.Checkbutton(self.settings_frame,
+                       text="Collect metrics",
+                       variable=self.metrics_enabled,
+                       command=self.toggle_metrics).pack(anchor=tk.W, padx=5, pady=2)
+        
+        ttk.Checkbutton(self.settings_frame,
+                       text="Profile scanning",
+                       variable=self.profiling_enabled,
+                       command=self.toggle_profiling).pack(anchor=tk.W, padx=5, pady=2)
+        
         ttk.Checkbutton(self.settings_frame,
                        text="Use Google Sheets",
                        variable=self.google_sheets_enabled,
@@ -119,10 +255,29 @@ class EnhancedQRScannerApp:
         
         # File format selection
         self.file_format = ttk.Combobox(self.settings_frame,
+                                      textvariable=self.file_format_choice,
                                       values=["CSV", "XML", "Excel", "Google Sheets"])
         self.file_format.set("CSV")
         self.file_format.pack(anchor=tk.W, padx=5, pady=2)
         
+        # CSV flush policy
+        ttk.Label(self.settings_frame, text="CSV flush policy:").pack(anchor=tk.W, padx=5)
+        self.flush_policy_combo = ttk.Combobox(self.settings_frame,
+                                             textvariable=self.csv_flush_policy,
+                                             values=sinks.FLUSH_POLICIES,
+                                             state='readonly')
+        self.flush_policy_combo.bind("<<ComboboxSelected>>", self.change_flush_policy)
+        self.flush_policy_combo.pack(anchor=tk.W, padx=5, pady=2)
+        
+        # Decoder backend
+        ttk.Label(self.settings_frame, text="Decoder:").pack(anchor=tk.W, padx=5)
+        self.decoder_combo = ttk.Combobox(self.settings_frame,
+                                        textvariable=self.decoder_choice,
+                                        values=["Auto"] + list(BACKENDS),
+                                        state='readonly')
+        self.decoder_combo.bind("<<ComboboxSelected>>", self.change_decoder)
+        self.decoder_combo.pack(anchor=tk.W, padx=5, pady=2)
+        
         # Spreadsheet section
         self.spreadsheet_frame = ttk.LabelFrame(self.right_panel, text="Spreadsheet")
         self.spreadsheet_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -147,7 +302,14 @@ class EnhancedQRScannerApp:
         self.history_tree.heading("SL No.", text="SL No.")
         self.history_tree.heading("Time", text="Time")
         self.history_tree.heading("Data", text="Data")
+        history_scroll = ttk.Scrollbar(self.history_frame, orient=tk.VERTICAL)
+        history_scroll.pack(side=tk.RIGHT, fill=tk.Y, pady=5)
         self.history_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.history = ScanHistory(self.history_tree, history_scroll,
+                                   capacity=self.history_capacity,
+                                   window=self.history_window,
+                                   load_older=self.load_older_history)
+        self.history.start()
 
     def setup_confirmation_dialog(self):
         self.confirm_dialog = tk.Toplevel(self.root)
@@ -165,12 +327,20 @@ class EnhancedQRScannerApp:
 
     def toggle_google_sheets(self):
         if self.google_sheets_enabled.get():
+            try:
+                import_google_client()
+            except ImportError as e:
+                messagebox.showerror("Error", f"Google Sheets support is not installed: {str(e)}")
+                self.google_sheets_enabled.set(False)
+                return
             self.setup_google_sheets()
         else:
+            self.close_exporters("Google Sheets")
             self.sheets_service = None
             self.spreadsheet_id = None
 
     def setup_google_sheets(self):
+        InstalledAppFlow, build, Request = import_google_client()
         creds = None
         if os.path.exists('token.pickle'):
             with open('token.pickle', 'rb') as token:
@@ -195,39 +365,245 @@ class EnhancedQRScannerApp:
             self.google_sheets_enabled.set(False)
 
     def scan_qr(self):
-        cap = cv2.VideoCapture(self.current_camera)
-        if not cap.isOpened():
-            messagebox.showerror("Error", "Failed to access the camera")
+        """Start the capture/decode/record pipeline for the current camera(s)"""
+        self.roi_tracker.reset()
+        if self.decoder_choice.get() == "Auto" and not self.calibrated:
+            self.start_calibration()
+        if self.scan_cameras and len(self.scan_cameras) > 1 and self.frame_source is None:
+            self.scan_several(self.scan_cameras)
+            return
+        decoder = self.get_process_decoder() if self.decode_processes else None
+        self.pipeline = ScanPipeline(
+            self.open_frame_source,
+            self.decode_frame,
+            self.handle_decoded if decoder is None else self.handle_process_results,
+            queue_size=self.queue_size,
+            drop_policy=self.drop_policy,
+            on_error=lambda message: self.show_error("Error", message),
+            metrics=self.metrics,
+            decoder=decoder)
+        self.pipeline.tracer = self.profiler
+        if not self.pipeline.start():
             self.is_scanning = False
+            self.scan_button.config(text="Start Scanning")
             return
-        
-        while self.is_scanning:
-            ret, frame = cap.read()
-            if not ret:
+        self.root.after(self.preview.interval_ms, self.refresh_preview, self.pipeline)
+
+    def get_process_decoder(self):
+        """Worker-process decoder matching the decode settings; kept across scans"""
+        ladder = self.decode_ladder
+        # Workers can't calibrate on the parent's frames; Auto uses the default backend
+        self.calibration_sample = None
+        backend = ladder.backend.name if self.calibrated or \
+            self.decoder_choice.get() != "Auto" else None
+        config = (self.decode_processes, tuple(ladder.symbols), ladder.scales,
+                  ladder.upscale, backend)
+        decoder = self.process_decoder
+        if decoder is not None and config == (decoder.workers, decoder.symbols, decoder.scales,
+                                              decoder.upscale, decoder.backend):
+            return decoder
+        if decoder is not None:
+            decoder.close()
+        self.process_decoder = ProcessDecoder(workers=self.decode_processes,
+                                              symbols=ladder.symbols, scales=ladder.scales,
+                                              upscale=ladder.upscale, backend=backend)
+        return self.process_decoder
+
+    def handle_process_results(self, frame, results):
+        """Record stage for frames decoded in worker processes"""
+        self.handle_decoded(frame, [result.data for result in results])
+
+    def scan_several(self, cameras):
+        """Scan ``cameras`` at once, merged into one capture-ordered stream"""
+        self.camera_decoders = {camera: (RoiTracker(), self.camera_ladder())
+                                for camera in cameras}
+        self.calibration_camera = cameras[0]
+        self.pipeline = MultiCameraScan(
+            cameras,
+            open_source,
+            self.decode_camera_frame,
+            self.handle_decoded,
+            reorder_ms=self.reorder_ms,
+            queue_size=self.queue_size,
+            drop_policy=self.drop_policy,
+            on_error=self.update_status,
+            metrics=self.metrics)
+        self.pipeline.tracer = self.profiler
+        if not self.pipeline.start():
+            self.pipeline = None
+            self.show_error("Error", "Failed to access the cameras")
+            self.is_scanning = False
+            self.scan_button.config(text="Start Scanning")
+            return
+        self.pipeline.rates()
+        self.stats_bar.pack(side=tk.RIGHT, before=self.status_bar, padx=(5, 0))
+        if self.stats_job is None:
+            self.stats_job = self.root.after(1000, self.update_stats)
+        self.root.after(self.preview.interval_ms, self.refresh_preview, self.pipeline)
+
+    def camera_ladder(self):
+        """A decode ladder like ``decode_ladder`` with its own backend (decoders aren't shared across threads)"""
+        ladder = self.decode_ladder
+        return DecodeLadder(scales=ladder.scales, upscale=ladder.upscale,
+                            symbols=ladder.symbols,
+                            max_upscale_pixels=ladder.max_upscale_pixels,
+                            backend=create_backend(ladder.backend.name, ladder.symbols),
+                            metrics=self.metrics)
+
+    def decode_camera_frame(self, camera, frame):
+        """Decode stage for one of several cameras: runs on that camera's decode thread"""
+        tracker, ladder = self.camera_decoders[camera]
+        if camera == self.calibration_camera:
+            # Calibrate on the first camera; the others follow its choice
+            sample = self.calibration_sample
+            if sample is not None:
+                self.collect_calibration_frame(sample, frame)
+        name = self.decode_ladder.backend.name
+        if ladder.backend.name != name:
+            ladder.backend = create_backend(name, ladder.symbols)
+        return [result.data for result in tracker.decode(frame, ladder.decode)]
+
+    def stop_scanning(self):
+        """Stop the pipeline and clear the preview"""
+        self.is_scanning = False
+        if self.pipeline:
+            self.pipeline.stop()
+            if isinstance(self.pipeline, MultiCameraScan):
+                rungs = " / ".join(f"cam {camera}: {ladder.summary()}" for camera, (_, ladder)
+                                   in self.camera_decoders.items())
+                if not self.metrics.enabled:
+                    self.stats_bar.pack_forget()
+            else:
+                rungs = self.decode_ladder.summary()
+            self.pipeline = None
+            self.update_status(f"Stopped. Decode rungs: {rungs}")
+
+    def open_frame_source(self):
+        """Open the configured frame source, defaulting to the selected camera"""
+        if self.frame_source is not None:
+            return open_source(self.frame_source)
+        return open_source(self.current_camera)
+
+    def decode_frame(self, frame):
+        """Decode stage: runs on the pipeline decode thread"""
+        sample = self.calibration_sample
+        if sample is not None:
+            self.collect_calibration_frame(sample, frame)
+        return [result.data for result in self.roi_tracker.decode(frame, self.decode_ladder.decode)]
+
+    def start_calibration(self):
+        """Sample frames for a fresh round of backend calibration"""
+        self.calibration_generation += 1
+        self.calibration_runs = 0
+        self.calibration_skip = 0
+        self.calibration_sample = []
+
+    def collect_calibration_frame(self, sample, frame):
+        """Sample frames from the running source; calibrates once enough are in"""
+        if self.calibration_skip:
+            self.calibration_skip -= 1
+            return
+        sample.append(frame)
+        if len(sample) < self.calibration_frames:
+            return
+        # Stop sampling and calibrate off the decode thread, which keeps decoding meanwhile
+        self.calibration_sample = None
+        threading.Thread(target=self.run_calibration,
+                         args=(sample, self.calibration_generation),
+                         name="decoder-calibration", daemon=True).start()
+
+    def run_calibration(self, sample, generation):
+        """Pick the best decoder backend for ``sample`` (runs on a worker thread)"""
+        try:
+            name, backend, report = calibrate(sample, self.decode_ladder.symbols,
+                                              target_hit_rate=self.calibration_target)
+        except ValueError as e:
+            self.update_status(f"Decoder calibration failed: {str(e)}")
+            return
+        if generation != self.calibration_generation:
+            return  # Decoder changed or a new scan started meanwhile
+        hits = round(report[name]['hit_rate'] * len(sample))
+        if hits < self.calibration_min_hits:
+            # Too few codes in view to judge; keep the current backend and retry later
+            self.calibration_runs += 1
+            if self.calibration_runs >= self.calibration_attempts:
+                self.update_status(f"Decoder: {self.decode_ladder.backend.name} "
+                                   f"(too few codes in view to calibrate)")
+                return
+            self.calibration_skip = self.calibration_backoff * 2 ** (self.calibration_runs - 1)
+            self.calibration_sample = []
+            return
+        self.decode_ladder.backend = backend
+        self.calibrated = True
+        self.update_status(f"Decoder: {name} ({format_report(report)})")
+
+    def change_decoder(self, event=None):
+        """Switch decoder backend, or recalibrate on the next scan for Auto"""
+        choice = self.decoder_choice.get()
+        self.calibrated = False
+        if choice == "Auto":
+            if self.is_scanning:
+                self.start_calibration()
+            return
+        self.calibration_generation += 1
+        self.calibration_sample = None
+        try:
+            self.decode_ladder.backend = create_backend(choice, self.decode_ladder.symbols)
+            self.update_status(f"Decoder: {choice}")
+        except (ImportError, OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Decoder {choice} is not available: {str(e)}")
+            self.decoder_choice.set("Auto")
+
+    def handle_decoded(self, frame, decoded, camera=None):
+        """Record stage: runs on the pipeline record (or multi-camera merge) thread"""
+        where = f"Camera {camera}: " if camera is not None else ""
+        if self.settings['multi_code']:
+            accepted = self.process_codes(decoded)
+            if not accepted:
+                return
+            summary = "\n".join(accepted[:10]) + ("\n..." if len(accepted) > 10 else "")
+            if self.settings['continuous_mode']:
+                self.root.after(0, self.show_toast, f"{where}Scanned {len(accepted)} code(s)")
+                return
+            self.frozen_frame = frame.copy()
+            pipeline = self.pipeline
+            if pipeline:
+                pipeline.pause()
+            self.root.after(0, self.show_confirmation, f"{where}{len(accepted)} code(s)\n{summary}")
+            return
+        for qr_data in decoded:
+            if not self.process_scan(qr_data):
                 continue
-            
-            # Convert frame for display
-            cv2image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA)
-            img = Image.fromarray(cv2image)
-            imgtk = ImageTk.PhotoImage(image=img)
-            self.video_label.imgtk = imgtk
-            self.video_label.configure(image=imgtk)
-            
-            # Scan for QR codes
-            decoded_objects = decode(frame)
-            for obj in decoded_objects:
-                qr_data = obj.data.decode("utf-8")
-                if self.process_scan(qr_data):
-                    self.frozen_frame = frame.copy()
-                    self.show_confirmation(qr_data)
-                    cap.release()
-                    return
-            
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-        
-        cap.release()
-        self.video_label.configure(image='')
+            if self.settings['continuous_mode']:
+                self.root.after(0, self.show_toast, f"{where}Scanned: {qr_data}")
+                continue
+            # Keep the camera open while the operator confirms
+            self.frozen_frame = frame.copy()
+            pipeline = self.pipeline
+            if pipeline:
+                pipeline.pause()
+            self.root.after(0, self.show_confirmation, f"{where}{qr_data}")
+            return
+
+    def refresh_preview(self, pipeline):
+        """Display stage: runs on the Tk main loop via root.after"""
+        if pipeline is not self.pipeline or not pipeline.running:
+            self.frozen_frame = None
+            self.preview.clear()
+            if pipeline is self.pipeline:
+                # The source ran out or failed
+                self.stop_scanning()
+                self.scan_button.config(text="Start Scanning")
+            return
+        if pipeline.paused:
+            # Show the frame that was decoded once, then hold it
+            frame, self.frozen_frame = self.frozen_frame, None
+        else:
+            item = pipeline.latest_preview()
+            frame = item[2] if item is not None else None
+        if frame is not None:
+            self.preview.render(frame)
+        self.root.after(self.preview.interval_ms, self.refresh_preview, pipeline)
 
     def show_confirmation(self, data):
         self.confirm_label.configure(text=f"Scanned Data:\n{data}")
@@ -236,115 +612,223 @@ class EnhancedQRScannerApp:
 
     def confirm_scan(self):
         self.confirm_dialog.withdraw()
-        self.last_scan = None
         self.frozen_frame = None
-        self.is_scanning = True
-        threading.Thread(target=self.scan_qr, daemon=True).start()
+        if self.pipeline:
+            self.pipeline.resume()
+
+    def setup_toast(self):
+        """Borderless, non-modal popup for continuous mode"""
+        self.toast = tk.Toplevel(self.root)
+        self.toast.withdraw()
+        self.toast.overrideredirect(True)
+        self.toast.attributes("-topmost", True)
+        self.toast_label = ttk.Label(self.toast, text="", padding=(12, 6),
+                                     background="#2e7d32", foreground="white")
+        self.toast_label.pack()
+
+    def show_toast(self, message):
+        """Flash a message over the camera feed without taking focus"""
+        self.toast_label.configure(text=message)
+        x = self.video_label.winfo_rootx() + 10
+        y = self.video_label.winfo_rooty() + 10
+        self.toast.geometry(f"+{x}+{y}")
+        self.toast.deiconify()
+        if self.toast_job is not None:
+            self.root.after_cancel(self.toast_job)
+        self.toast_job = self.root.after(self.toast_ms, self.hide_toast)
+
+    def hide_toast(self):
+        self.toast_job = None
+        self.toast.withdraw()
 
     def process_scan(self, data):
         """Process scanned QR code data"""
+        return bool(self.process_codes([data]))
+
+    def process_codes(self, codes):
+        """Record the codes read from one frame; returns the ones accepted.
+
+        Each code counts once per frame, and all accepted codes share one
+        timestamp and are saved in a single journal transaction.
+        """
         current_time = datetime.now()
         
-        # Check for duplicate if enabled
-        if self.duplicate_check.get():
-            if data == self.last_scan:
-                self.update_status(f"Duplicate scan ignored: {data}")
-                return False
+        start = time.perf_counter()
+        accepted = []
+        for data in dict.fromkeys(codes):
+            # Check for duplicate if enabled
+            if self.settings['duplicate_check']:
+                if not self.duplicate_index.check_and_add(data):
+                    continue
+            else:
+                self.duplicate_index.add(data)
+            accepted.append(data)
+        self.metrics.observe("dedupe", time.perf_counter() - start)
+        self.metrics.inc("codes_accepted", len(accepted))
+        if not accepted:
+            self.update_status(f"Duplicate scan ignored: {', '.join(dict.fromkeys(codes))}")
+            return []
         
-        self.last_scan = data
+        timestamp = current_time.strftime('%Y-%m-%d %H:%M:%S')
+        rows = [(self.current_sl_no + i, timestamp, data) for i, data in enumerate(accepted)]
         
-        # Add to history
-        self.history_tree.insert('', 0, values=(self.current_sl_no, 
-                                              current_time.strftime('%H:%M:%S'), 
-                                              data))
+        # Add to history (inserted in batches on the Tk thread)
+        for sl_no, _, data in rows:
+            self.history.add((sl_no, current_time.strftime('%H:%M:%S'), data),
+                             current_time.timestamp())
         
         # Save to file if auto-save is enabled
-        if self.auto_save.get():
-            self.save_data(data)
+        if self.settings['auto_save']:
+            self.save_rows(rows, current_time.timestamp())
         
-        self.current_sl_no += 1
-        self.update_status(f"Scanned: {data}")
-        return True
+        self.current_sl_no += len(rows)
+        scanned = accepted[0] if len(accepted) == 1 else f"{len(accepted)} codes"
+        backlog = self.export_backlog()
+        if backlog:
+            self.update_status(f"Scanned: {scanned} ({backlog} rows waiting to be exported)")
+        else:
+            self.update_status(f"Scanned: {scanned}")
+        return accepted
+
+    def load_older_history(self, before, limit):
+        """History rows from the journal for scans that left the in-memory buffer.
+
+        Journal rows are keyed by id, which ``ScanHistory`` hands back as
+        ``before`` for the next page, so a page never ends partway through
+        the codes of one frame; the first page starts below the oldest
+        in-memory scan that was journaled.
+        """
+        if isinstance(before, tuple):
+            before_id = before[1]
+        else:
+            newer = [row_id for recorded_at, row_id in list(self.journaled)
+                     if recorded_at >= before]
+            before_id = min(newer) if newer else None
+        return [(("id", row_id), (sl_no, time_of_day(timestamp), data))
+                for row_id, sl_no, timestamp, data in self.journal.rows_before(before_id, limit)]
 
-    def save_data(self, data):
-        if not self.spreadsheet_path and not self.google_sheets_enabled.get():
+    def save_rows(self, rows, recorded_at=None):
+        """Save (sl_no, timestamp, data) rows from one frame in one batch"""
+        if not self.spreadsheet_path and not self.settings['google_sheets_enabled']:
             return False
         
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        if self.google_sheets_enabled.get():
-            return self.save_to_google_sheets(current_time, data)
+        # The journal commit is the durable record; the linked file or sheet
+        # is filled in from it by an exporter thread in one write per batch
+        sheets = self.settings['google_sheets_enabled']
+        if sheets:
+            target = export_name("Google Sheets", self.spreadsheet_id)
+        else:
+            target = export_name(self.settings['file_format'], self.spreadsheet_path)
+        try:
+            start = time.perf_counter()
+            last_id = self.journal.append(rows, same_frame=len(rows) > 1, target=target)
+            self.metrics.observe("journal_append", time.perf_counter() - start)
+            if recorded_at is not None:
+                self.journaled.append((recorded_at, last_id - len(rows) + 1))
+        except Exception as e:
+            self.show_error("Error", f"Failed to save data: {str(e)}")
+            return False
         
-        file_format = self.file_format.get()
         try:
-            if file_format == "CSV":
-                self.save_to_csv(current_time, data)
-            elif file_format == "XML":
-                self.save_to_xml(current_time, data)
-            elif file_format == "Excel":
-                self.save_to_excel(current_time, data)
+            if sheets:
+                return self.get_sheets_exporter() is not None
+            self.get_file_exporter(self.settings['file_format'])
             return True
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save data: {str(e)}")
+            self.show_error("Error", f"Failed to open {self.spreadsheet_path}: {str(e)}")
             return False
 
-    def save_to_csv(self, timestamp, data):
-        if not os.path.exists(self.spreadsheet_path):
-            with open(self.spreadsheet_path, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(['SL No.', 'Timestamp', 'Data'])
-        
-        with open(self.spreadsheet_path, 'a', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow([self.current_sl_no, timestamp, data])
+    def start_exporter(self, file_format, target, sink, fresh=False):
+        """Start tailing the journal into ``sink``; ``fresh`` skips rows already journaled"""
+        key = (file_format, target)
+        if key in self.exporters:
+            self.exporters.pop(key).close()
+        start_id = self.journal.last_id() if fresh else None
+        exporter = Exporter(self.journal, sink, target, start_id=start_id,
+                            on_error=self.update_status, metrics=self.metrics)
+        self.exporters[key] = exporter
+        return exporter
 
-    def save_to_xml(self, timestamp, data):
-        if not os.path.exists(self.spreadsheet_path):
-            root = ET.Element("scans")
-            tree = ET.ElementTree(root)
-        else:
-            tree = ET.parse(self.spreadsheet_path)
-            root = tree.getroot()
-        
-        scan = ET.SubElement(root, "scan")
-        ET.SubElement(scan, "sl_no").text = str(self.current_sl_no)
-        ET.SubElement(scan, "timestamp").text = timestamp
-        ET.SubElement(scan, "data").text = data
-        
-        tree.write(self.spreadsheet_path)
+    def get_file_exporter(self, file_format, fresh=False):
+        """Exporter for the linked file in ``file_format``, started on first use"""
+        with self.sink_lock:
+            key = (file_format, self.spreadsheet_path)
+            if key in self.exporters:
+                if not fresh:
+                    return self.exporters[key]
+                self.exporters.pop(key).close()
+            sink = sinks.open_sink(self.spreadsheet_path, file_format, truncate=fresh,
+                                   **self.sink_options())
+            return self.start_exporter(file_format, self.spreadsheet_path, sink, fresh)
 
-    def save_to_excel(self, timestamp, data):
-        if not os.path.exists(self.spreadsheet_path):
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.append(['SL No.', 'Timestamp', 'Data'])
-        else:
-            wb = openpyxl.load_workbook(self.spreadsheet_path)
-            ws = wb.active
-        
-        ws.append([self.current_sl_no, timestamp, data])
-        wb.save(self.spreadsheet_path)
-
-    def save_to_google_sheets(self, timestamp, data):
+    def get_sheets_exporter(self):
+        """Exporter feeding the write-behind writer for the linked Google Sheet"""
         if not self.sheets_service or not self.spreadsheet_id:
-            return False
-        
-        try:
-            values = [[self.current_sl_no, timestamp, data]]
-            body = {'values': values}
-            self.sheets_service.spreadsheets().values().append(
-                spreadsheetId=self.spreadsheet_id,
-                range='A:C',
-                valueInputOption='RAW',
-                insertDataOption='INSERT_ROWS',
-                body=body).execute()
-            return True
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save to Google Sheets: {str(e)}")
-            return False
+            return None
+        with self.sink_lock:
+            key = ("Google Sheets", self.spreadsheet_id)
+            if key in self.exporters:
+                return self.exporters[key]
+            os.makedirs(self.outbox_dir, exist_ok=True)
+            outbox = sinks.Outbox(os.path.join(self.outbox_dir, f"{self.spreadsheet_id}.jsonl"))
+            writer = sinks.SheetsWriter(
+                self.sheets_service, self.spreadsheet_id,
+                batch_size=self.sheets_batch_size,
+                flush_interval=self.sheets_flush_interval,
+                on_error=self.update_status,
+                outbox=outbox,
+                metrics=self.metrics)
+            return self.start_exporter("Google Sheets", self.spreadsheet_id, writer)
+
+    def resume_exports(self):
+        """Let file exports that fell behind before the last exit catch up"""
+        for file_format, target in self.journal.lagging_exports():
+            if file_format in sinks.FILE_WRITERS and os.path.exists(target):
+                try:
+                    sink = sinks.open_sink(target, file_format, **self.sink_options())
+                except Exception as e:
+                    self.update_status(f"Could not resume export to {target}: {str(e)}")
+                    continue
+                self.start_exporter(file_format, target, sink)
+
+    def export_backlog(self):
+        """Rows journaled but not yet delivered by every exporter"""
+        backlog = 0
+        for exporter in list(self.exporters.values()):
+            backlog = max(backlog, exporter.lag + getattr(exporter.sink, 'queue_depth', 0))
+        return backlog
+
+    def close_exporters(self, file_format=None):
+        """Drain and close exporters (all, or only those for ``file_format``)"""
+        with self.sink_lock:
+            for key in list(self.exporters):
+                if file_format is None or key[0] == file_format:
+                    self.exporters.pop(key).close()
+
+    def detach_file_exporters(self, keep=None):
+        """Drain and close file exporters other than ``keep``; they are not resumed next start"""
+        with self.sink_lock:
+            for key in list(self.exporters):
+                if key[0] in sinks.FILE_WRITERS and key != keep:
+                    self.exporters.pop(key).close(detach=True)
+
+    def sink_options(self):
+        return {'checkpoint_rows': self.excel_checkpoint_rows,
+                'checkpoint_seconds': self.excel_checkpoint_seconds,
+                'flush_policy': self.settings['csv_flush_policy'],
+                'flush_rows': self.csv_flush_rows,
+                'flush_ms': self.csv_flush_ms}
+
+    def change_flush_policy(self, event=None):
+        """Apply the CSV flush policy chosen in Settings to open CSV files"""
+        for (file_format, target), exporter in list(self.exporters.items()):
+            if file_format == "CSV":
+                exporter.sink.set_policy(self.csv_flush_policy.get())
+                self.update_status(f"CSV: {exporter.sink.describe()}")
 
     def setup_google_sheets(self):
         """Setup Google Sheets authentication using direct OAuth flow"""
+        _, build, Request = import_google_client()
         # Client configuration for installed applications
         CLIENT_CONFIG = {
             "installed": {
@@ -458,6 +942,7 @@ class EnhancedQRScannerApp:
 
     def complete_oauth_flow(self, client_config):
         """Complete the OAuth flow after getting client credentials"""
+        InstalledAppFlow, build, _ = import_google_client()
         try:
             flow = InstalledAppFlow.from_client_config(
                 client_config, self.SCOPES,
@@ -510,6 +995,10 @@ class EnhancedQRScannerApp:
             ttk.Button(auth_dialog, text="Submit", 
                     command=complete_auth).pack(pady=20)
 
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to start OAuth flow: {str(e)}")
+            self.google_sheets_enabled.set(False)
+
 
     def get_spreadsheet_link(self):
         """Prompt user for Google Sheets link and extract spreadsheet ID"""
@@ -555,6 +1044,8 @@ class EnhancedQRScannerApp:
                 sheet_title = sheet_metadata['properties']['title']
                 
                 self.path_label.config(text=f"Linked to Google Sheet: {sheet_title}")
+                # Start draining rows left in the outbox by a previous session
+                self.get_sheets_exporter()
                 messagebox.showinfo("Success", 
                     "Successfully connected to Google Sheet!")
                 
@@ -589,39 +1080,80 @@ class EnhancedQRScannerApp:
                 file_types = [("Excel files", "*.xlsx")]
                 default_ext = ".xlsx"
             
+            # Existing files are appended to, so don't ask to replace them
             filepath = filedialog.asksaveasfilename(
                 defaultextension=default_ext,
-                filetypes=file_types
+                filetypes=file_types,
+                confirmoverwrite=False
             )
             
             if filepath:
                 self.spreadsheet_path = filepath
                 self.path_label.config(text=f"Linked to: {os.path.basename(filepath)}")
                 
-                # Initialize the file with headers based on format
+                # New files get headers; existing ones keep their rows and seed
+                # the duplicate index
+                exists = os.path.exists(filepath) and os.path.getsize(filepath) > 0
+                self.detach_file_exporters(keep=(file_format, filepath))
+                exporter = self.get_file_exporter(file_format, fresh=not exists)
                 if file_format == "CSV":
-                    with open(filepath, 'w', newline='') as csvfile:
-                        writer = csv.writer(csvfile)
-                        writer.writerow(['SL No.', 'Timestamp', 'Data'])
-                elif file_format == "XML":
-                    root = ET.Element("scans")
-                    tree = ET.ElementTree(root)
-                    tree.write(filepath)
-                elif file_format == "Excel":
-                    wb = openpyxl.Workbook()
-                    ws = wb.active
-                    ws.append(['SL No.', 'Timestamp', 'Data'])
-                    wb.save(filepath)
+                    self.update_status(f"CSV: {exporter.sink.describe()}")
+                self.duplicate_index.clear()
+                if exists:
+                    threading.Thread(target=self.load_duplicate_index, args=(filepath,),
+                                     daemon=True).start()
+
+    def load_duplicate_index(self, filepath):
+        """Seed the duplicate index from the linked file (runs on a worker thread)"""
+        try:
+            count = self.duplicate_index.load_file(filepath)
+            self.update_status(f"Loaded {count} previous scans from {os.path.basename(filepath)}")
+        except Exception as e:
+            self.update_status(f"Could not read previous scans: {str(e)}")
+
+    def change_preview_fps(self, *args):
+        """Apply the preview rate from Settings"""
+        try:
+            fps = self.preview_fps.get()
+        except tk.TclError:
+            return
+        if fps > 0:
+            self.preview.fps = fps
+
+    def change_duplicate_window(self, *args):
+        """Apply the repeat window from Settings to the duplicate index"""
+        try:
+            minutes = self.duplicate_window.get()
+        except tk.TclError:
+            return
+        self.duplicate_index.ttl = minutes * 60 if minutes > 0 else None
                         
     def get_available_cameras(self):
-        """Get list of available camera indices"""
-        available_cameras = []
-        for i in range(10):  # Check first 10 camera indices
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                available_cameras.append(i)
-                cap.release()
-        return available_cameras
+        """Cameras found last time (instant); ``refresh_cameras`` probes for real"""
+        return load_cached_cameras() or [0]
+
+    def refresh_cameras(self):
+        """Probe cameras in the background and refill the combobox when done"""
+        self.camera_discovery = discover_async(
+            lambda cameras: self.root.after(0, self.set_cameras, cameras), max_index=10)
+
+    def camera_choices(self):
+        """Combobox entries: each camera, plus all of them when there are several"""
+        choices = [f"Camera {i}" for i in self.available_cameras]
+        if len(self.available_cameras) > 1:
+            choices.append(ALL_CAMERAS)
+        return choices
+
+    def set_cameras(self, cameras):
+        """Main-thread update of the camera list after discovery"""
+        self.available_cameras = cameras or [0]
+        self.camera_combo.configure(values=self.camera_choices())
+        choice = self.camera_combo.get()
+        if not self.is_scanning and choice not in self.camera_choices() and \
+                not choice.startswith("Cameras "):
+            self.camera_combo.set(f"Camera {self.available_cameras[0]}")
+        if not cameras:
+            self.update_status("No camera found")
 
     def toggle_scanning(self):
         """Toggle QR code scanning on/off"""
@@ -632,25 +1164,169 @@ class EnhancedQRScannerApp:
             
             self.is_scanning = True
             self.scan_button.config(text="Stop Scanning")
-            self.current_camera = int(self.camera_combo.get().split()[-1])
-            threading.Thread(target=self.scan_qr, daemon=True).start()
+            choice = self.camera_combo.get()
+            if choice == ALL_CAMERAS:
+                self.scan_cameras = list(self.available_cameras)
+            elif choice.startswith("Cameras "):
+                self.scan_cameras = [int(i) for i in choice.split()[-1].split(",")]
+            else:
+                self.scan_cameras = None
+                self.current_camera = int(choice.split()[-1])
+            self.scan_qr()
         else:
-            self.is_scanning = False
+            self.stop_scanning()
             self.scan_button.config(text="Start Scanning")
     
+    def toggle_metrics(self):
+        """Start or stop collecting and exporting per-stage metrics"""
+        enabled = self.metrics_enabled.get()
+        self.metrics.enabled = enabled
+        if enabled:
+            if self.metrics_exporter is None:
+                self.metrics_exporter = MetricsExporter(self.metrics, self.metrics_dir,
+                                                        self.metrics_interval)
+            self.stats_bar.pack(side=tk.RIGHT, before=self.status_bar, padx=(5, 0))
+            self.rates.rates("frames_captured", "frames_decoded", "frames_with_codes")
+            if self.stats_job is None:
+                self.stats_job = self.root.after(1000, self.update_stats)
+        else:
+            if self.metrics_exporter is not None:
+                self.metrics_exporter.close()
+                self.metrics_exporter = None
+            if not isinstance(self.pipeline, MultiCameraScan):
+                self.stats_bar.pack_forget()
+
+    def update_stats(self):
+        """Refresh capture/decode FPS and hit rate once a second (per camera when scanning several)"""
+        pipeline = self.pipeline
+        if isinstance(pipeline, MultiCameraScan):
+            self.stats_bar.config(text=" | ".join(
+                f"Cam {camera} {captured:.1f}/{decoded:.1f} fps, {hit_rate:.0%} hits"
+                for camera, (captured, decoded, hit_rate) in pipeline.rates().items()))
+            self.stats_job = self.root.after(1000, self.update_stats)
+            return
+        if not self.metrics.enabled:
+            self.stats_job = None
+            return
+        rates = self.rates.rates("frames_captured", "frames_decoded", "frames_with_codes")
+        decoded = rates["frames_decoded"]
+        hit_rate = rates["frames_with_codes"] / decoded if decoded else 0.0
+        self.stats_bar.config(text=f"Capture {rates['frames_captured']:.1f} fps | "
+                                   f"Decode {decoded:.1f} fps | Hits {hit_rate:.0%}")
+        self.stats_job = self.root.after(1000, self.update_stats)
+
+    def toggle_profiling(self):
+        """Start a bounded profiling session, or end the running one early"""
+        if self.profiling_enabled.get():
+            path = self.profiler.start()
+            self.update_status(f"Profiling for {self.profiler.duration:.0f} s into {path}")
+        else:
+            threading.Thread(target=self.profiler.stop, name="profile-stop", daemon=True).start()
+
+    def profiling_done(self, path):
+        """Called from the profiler thread once the results are written"""
+        self.update_status(f"Profile written to {path}")
+        self.root.after(0, self.profiling_enabled.set, False)
+
     def update_status(self, message):
-        """Update status bar message"""
-        self.status_bar.config(text=message)
+        """Update status bar message (safe to call from any thread)"""
+        if threading.current_thread() is threading.main_thread():
+            self.status_bar.config(text=message)
+        else:
+            self.root.after(0, self.status_bar.config, {'text': message})
+
+    def show_error(self, title, message):
+        """Show an error dialog from any thread"""
+        if threading.current_thread() is threading.main_thread():
+            messagebox.showerror(title, message)
+        else:
+            self.root.after(0, messagebox.showerror, title, message)
     
     def safe_close(self):
         """Safely close the application"""
         if messagebox.askyesno("Quit", "Are you sure you want to quit?"):
-            self.is_scanning = False
+            self.stop_scanning()
+            self.close_exporters()
+            if self.metrics_exporter is not None:
+                self.metrics_exporter.close()
+            self.profiler.stop()
+            if self.process_decoder is not None:
+                self.process_decoder.close()
+            self.journal.close()
             self.root.after(100, self.root.destroy)
 
-def main():
+def report_startup(args):
+    """Stop timing imports; print the report when asked for"""
+    startup.timer.uninstall()
+    if args.startup_report:
+        print(startup.timer.report(args.startup_target_ms))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enhanced QR Scanner")
+    parser.add_argument("--source", default=None,
+                        help="camera index, video file, image folder/glob or "
+                             "synthetic[:noise=N,blur=N,rotation=DEG,...] instead of the camera combobox")
+    parser.add_argument("--cameras", default=None,
+                        help="comma-separated camera indices scanned at once, e.g. 0,2 "
+                             "(default: the camera chosen in the window)")
+    parser.add_argument("--symbols", default="QRCODE",
+                        help="comma-separated symbologies to decode, e.g. QRCODE,CODE128 (default: QRCODE)")
+    parser.add_argument("--decode-scales", default="0.5,1",
+                        help="comma-separated decode scales tried smallest first (default: 0.5,1)")
+    parser.add_argument("--decoder", default="Auto", choices=["Auto"] + list(BACKENDS),
+                        help="decoder backend; Auto calibrates on frames from the source (default)")
+    parser.add_argument("--upscale", type=float, default=2.0,
+                        help="last-resort upscale factor for small images, 0 to disable (default: 2)")
+    parser.add_argument("--decode-processes", type=int, default=0, metavar="N",
+                        help="decode in N worker processes fed through a shared-memory frame "
+                             "ring, to use more than one core per camera (default: 0, a thread)")
+    parser.add_argument("--multi-code", action="store_true",
+                        help="record every code in a frame as one batch (default: one code per scan)")
+    parser.add_argument("--preview-fps", type=int, default=15,
+                        help="camera preview refresh rate; decoding runs at its own pace (default: 15)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="collect per-stage latency/throughput metrics from startup")
+    parser.add_argument("--metrics-dir", default="metrics",
+                        help="where metrics.json and metrics.prom are written (default: metrics)")
+    parser.add_argument("--profile", type=float, default=None, metavar="SECONDS",
+                        help="profile the scan loop for SECONDS from startup (cProfile, "
+                             "tracemalloc and per-frame trace)")
+    parser.add_argument("--profile-dir", default="profiles",
+                        help="parent folder for timestamped profile output (default: profiles)")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print per-module import times once the window is up")
+    parser.add_argument("--startup-target-ms", type=float, default=1000,
+                        help="cold-start budget the startup report checks against (default: 1000)")
+    args = parser.parse_args(argv)
+
     root = tk.Tk()
     app = EnhancedQRScannerApp(root)
+    app.frame_source = args.source
+    if args.cameras:
+        cameras = [int(i) for i in args.cameras.split(",")]
+        app.camera_combo.set(f"Camera {cameras[0]}" if len(cameras) == 1
+                             else f"Cameras {','.join(map(str, cameras))}")
+    app.preview_fps.set(args.preview_fps)
+    app.multi_code.set(args.multi_code)
+    app.decode_processes = args.decode_processes
+    app.decode_ladder = DecodeLadder(
+        scales=[float(scale) for scale in args.decode_scales.split(",")],
+        upscale=args.upscale,
+        symbols=args.symbols.split(","),
+        metrics=app.metrics)
+    app.metrics_dir = args.metrics_dir
+    app.profiler.directory = args.profile_dir
+    if args.profile:
+        app.profiler.duration = args.profile
+        app.profiling_enabled.set(True)
+        app.toggle_profiling()
+    if args.metrics:
+        app.metrics_enabled.set(True)
+        app.toggle_metrics()
+    app.decoder_choice.set(args.decoder)
+    app.change_decoder()
+    root.after_idle(report_startup, args)
     root.mainloop()
 
 if __name__ == "__main__":
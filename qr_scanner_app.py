@@ -1,19 +1,27 @@
+import startup
+startup.timer.install()
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import cv2
-from pyzbar.pyzbar import decode
-import csv
 from datetime import datetime
 import os
-import pandas as pd
 import threading
-from PIL import Image, ImageTk
+import argparse
+from collections import deque
+from pipeline import ScanPipeline, DROP_OLDEST
+from frame_sources import open_source
+from preview import PreviewRenderer
+from cameras import load_cached_cameras, discover_async
+from decoding import RoiTracker, DecodeLadder
+import sinks
+from dedupe import DuplicateIndex
+from history import CsvRowIndex, ScanHistory, time_of_day
 
 class EnhancedQRScannerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Enhanced QR Scanner")
         self.root.geometry("800x600")
+        self.root.protocol("WM_DELETE_WINDOW", self.safe_close)
         
         # Theme and styling
         style = ttk.Style()
@@ -24,12 +32,45 @@ class EnhancedQRScannerApp:
         self.is_scanning = False
         self.current_camera = 0
         self.available_cameras = self.get_available_cameras()
-        self.last_scan = None
         self.duplicate_check = tk.BooleanVar(value=True)
+        self.duplicate_index = DuplicateIndex()
         self.auto_save = tk.BooleanVar(value=True)
+        self.pipeline = None
+        self.frame_source = None  # camera index, video, image folder or "synthetic[:opts]"
+        self.queue_size = 1
+        self.drop_policy = DROP_OLDEST
+        self.preview_fps = 15  # display rate, independent of decoding
+        self.history_capacity = 1000  # scans kept in memory; older ones are read from the CSV
+        self.history_window = 200
+        self.roi_tracker = RoiTracker()
+        self.decode_ladder = DecodeLadder()
+        self.last_polygons = []
+        self.csv_sink = None
+        self.csv_index = None  # row offsets of the linked CSV, for paging old history
+        self.csv_lock = threading.Lock()  # keeps rows_written in step with the file
+        self.rows_written = 0  # rows this session added to the linked CSV
+        self.written_at = deque(maxlen=self.history_capacity)  # (recorded_at, row number)
+        self.csv_flush_policy = tk.StringVar(value=sinks.FLUSH_EVERY_ROW)
         
         self.setup_ui()
+        self.mirror_settings()
+        self.refresh_cameras()
         
+    def mirror_settings(self):
+        """Keep plain copies of the settings the record thread reads.
+
+        Tk may only be called from the main thread, so ``process_scan``
+        reads ``self.settings`` instead of the variables; the traces below
+        update it on the main thread whenever a setting changes.
+        """
+        self.settings = {}
+        variables = {'duplicate_check': self.duplicate_check,
+                     'auto_save': self.auto_save}
+        for name, variable in variables.items():
+            self.settings[name] = variable.get()
+            variable.trace_add("write", lambda *args, name=name, variable=variable:
+                               self.settings.__setitem__(name, variable.get()))
+
     def setup_ui(self):
         # Main container
         self.main_container = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
@@ -45,6 +86,7 @@ class EnhancedQRScannerApp:
         
         self.video_label = ttk.Label(self.camera_frame)
         self.video_label.pack(fill=tk.BOTH, expand=True)
+        self.preview = PreviewRenderer(self.video_label, fps=self.preview_fps)
         
         # Camera controls
         self.controls_frame = ttk.Frame(self.left_panel)
@@ -52,7 +94,7 @@ class EnhancedQRScannerApp:
         
         self.camera_combo = ttk.Combobox(self.controls_frame, 
                                        values=[f"Camera {i}" for i in self.available_cameras])
-        self.camera_combo.set("Camera 0")
+        self.camera_combo.set(f"Camera {self.available_cameras[0]}")
         self.camera_combo.pack(side=tk.LEFT, padx=5)
         
         self.scan_button = ttk.Button(self.controls_frame, 
@@ -76,6 +118,14 @@ class EnhancedQRScannerApp:
                        text="Auto-save", 
                        variable=self.auto_save).pack(anchor=tk.W, padx=5, pady=2)
         
+        ttk.Label(self.settings_frame, text="Flush policy:").pack(anchor=tk.W, padx=5)
+        self.flush_policy_combo = ttk.Combobox(self.settings_frame,
+                                             textvariable=self.csv_flush_policy,
+                                             values=sinks.FLUSH_POLICIES,
+                                             state='readonly')
+        self.flush_policy_combo.bind("<<ComboboxSelected>>", self.change_flush_policy)
+        self.flush_policy_combo.pack(anchor=tk.W, padx=5, pady=2)
+        
         # Spreadsheet section
         self.spreadsheet_frame = ttk.LabelFrame(self.right_panel, text="Spreadsheet")
         self.spreadsheet_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -99,21 +149,37 @@ class EnhancedQRScannerApp:
                                        show="headings")
         self.history_tree.heading("Time", text="Time")
         self.history_tree.heading("Data", text="Data")
+        history_scroll = ttk.Scrollbar(self.history_frame, orient=tk.VERTICAL)
+        history_scroll.pack(side=tk.RIGHT, fill=tk.Y, pady=5)
         self.history_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.history = ScanHistory(self.history_tree, history_scroll,
+                                   capacity=self.history_capacity,
+                                   window=self.history_window,
+                                   load_older=self.load_older_history)
+        self.history.start()
         
         # Status bar
         self.status_bar = ttk.Label(self.root, text="Ready", relief=tk.SUNKEN)
         self.status_bar.pack(fill=tk.X, side=tk.BOTTOM, padx=5, pady=2)
         
     def get_available_cameras(self):
-        """Check for available cameras"""
-        available = []
-        for i in range(5):  # Check first 5 possible camera indices
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                available.append(i)
-                cap.release()
-        return available if available else [0]
+        """Cameras found last time (instant); ``refresh_cameras`` probes for real"""
+        return load_cached_cameras() or [0]
+
+    def refresh_cameras(self):
+        """Probe cameras in the background and refill the combobox when done"""
+        discover_async(lambda cameras: self.root.after(0, self.set_cameras, cameras),
+                       max_index=5)
+
+    def set_cameras(self, cameras):
+        """Main-thread update of the camera list after discovery"""
+        self.available_cameras = cameras or [0]
+        self.camera_combo.configure(values=[f"Camera {i}" for i in self.available_cameras])
+        if not self.is_scanning and \
+                int(self.camera_combo.get().split()[-1]) not in self.available_cameras:
+            self.camera_combo.set(f"Camera {self.available_cameras[0]}")
+        if not cameras:
+            self.update_status("No camera found")
     
     def toggle_scanning(self):
         if not self.is_scanning:
@@ -125,70 +191,79 @@ class EnhancedQRScannerApp:
             self.scan_button.configure(text="Stop Scanning")
             self.camera_combo.configure(state='disabled')
             self.current_camera = int(self.camera_combo.get().split()[-1])
-            threading.Thread(target=self.scan_qr, daemon=True).start()
+            self.scan_qr()
         else:
             self.is_scanning = False
+            if self.pipeline:
+                self.pipeline.stop()
+                self.pipeline = None
+            self.last_polygons = []
             self.scan_button.configure(text="Start Scanning")
             self.camera_combo.configure(state='normal')
     
     def scan_qr(self):
-        cap = cv2.VideoCapture(self.current_camera)
-        if not cap.isOpened():
-            messagebox.showerror("Error", "Failed to access the camera")
-            self.is_scanning = False
+        """Start the capture/decode/record pipeline for the current camera"""
+        self.roi_tracker.reset()
+        self.pipeline = ScanPipeline(
+            self.open_frame_source,
+            self.decode_frame,
+            self.handle_decoded,
+            queue_size=self.queue_size,
+            drop_policy=self.drop_policy,
+            on_error=lambda message: self.root.after(0, messagebox.showerror, "Error", message))
+        if not self.pipeline.start():
+            self.toggle_scanning()
             return
-        
-        while self.is_scanning:
-            ret, frame = cap.read()
-            if not ret:
-                continue
-            
-            # Convert frame for display
-            cv2image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA)
-            img = Image.fromarray(cv2image)
-            imgtk = ImageTk.PhotoImage(image=img)
-            self.video_label.imgtk = imgtk
-            self.video_label.configure(image=imgtk)
-            
-            # Scan for QR codes
-            decoded_objects = decode(frame)
-            for obj in decoded_objects:
-                qr_data = obj.data.decode("utf-8")
-                if self.process_scan(qr_data):
-                    # Draw rectangle around detected QR code
-                    points = obj.polygon
-                    if len(points) > 4:
-                        hull = cv2.convexHull(
-                            numpy.array([point for point in points], dtype=numpy.float32))
-                        points = hull
-                    
-                    cv2.polylines(frame, [numpy.array(points, dtype=numpy.int32)],
-                                True, (0, 255, 0), 3)
-            
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-        
-        cap.release()
-        self.video_label.configure(image='')
+        self.root.after(self.preview.interval_ms, self.refresh_preview, self.pipeline)
+
+    def open_frame_source(self):
+        """Open the configured frame source, defaulting to the selected camera"""
+        if self.frame_source is not None:
+            return open_source(self.frame_source)
+        return open_source(self.current_camera)
+
+    def decode_frame(self, frame):
+        """Decode stage: runs on the pipeline decode thread"""
+        return self.roi_tracker.decode(frame, self.decode_ladder.decode)
+
+    def handle_decoded(self, frame, decoded):
+        """Record stage: runs on the pipeline record thread"""
+        polygons = []
+        for qr_data, points in decoded:
+            if self.process_scan(qr_data):
+                polygons.append(points)
+        if polygons:
+            self.last_polygons = polygons
+
+    def refresh_preview(self, pipeline):
+        """Display stage: runs on the Tk main loop via root.after"""
+        if pipeline is not self.pipeline or not pipeline.running:
+            self.preview.clear()
+            return
+        item = pipeline.latest_preview()
+        if item is not None:
+            # Outline the last recorded QR codes
+            self.preview.render(item[2], self.last_polygons)
+        self.root.after(self.preview.interval_ms, self.refresh_preview, pipeline)
         
     def process_scan(self, data):
         """Process scanned QR code data"""
         current_time = datetime.now()
         
         # Check for duplicate if enabled
-        if self.duplicate_check.get():
-            if data == self.last_scan:
+        if self.settings['duplicate_check']:
+            if not self.duplicate_index.check_and_add(data):
                 self.update_status(f"Duplicate scan ignored: {data}")
                 return False
+        else:
+            self.duplicate_index.add(data)
         
-        self.last_scan = data
-        
-        # Add to history
-        self.history_tree.insert('', 0, values=(current_time.strftime('%H:%M:%S'), data))
+        # Add to history (inserted in batches on the Tk thread)
+        self.history.add((current_time.strftime('%H:%M:%S'), data), current_time.timestamp())
         
         # Save to spreadsheet if auto-save is enabled
-        if self.auto_save.get():
-            self.add_to_spreadsheet(data)
+        if self.settings['auto_save']:
+            self.add_to_spreadsheet(data, current_time.timestamp())
         
         self.update_status(f"Scanned: {data}")
         return True
@@ -203,36 +278,145 @@ class EnhancedQRScannerApp:
         
         if file_path:
             self.spreadsheet_path = file_path
-            if not os.path.exists(file_path):
-                # Create new spreadsheet with headers
-                with open(file_path, 'w', newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(['Timestamp', 'Data'])
+            self.duplicate_index.clear()
+            existing = os.path.exists(file_path) and os.path.getsize(file_path) > 0
+            with self.csv_lock:
+                # The record thread writes under the same lock, so never into a closed sink
+                if self.csv_sink:
+                    self.csv_sink.close()
+                # Keep one writer open for the linked file (creates it with headers)
+                self.csv_sink = sinks.CsvSink(file_path, headers=['Timestamp', 'Data'],
+                                              flush_policy=self.csv_flush_policy.get())
+                self.csv_index = CsvRowIndex(file_path, base=os.path.getsize(file_path))
+                self.rows_written = 0
+                self.written_at.clear()
+            if existing:
+                threading.Thread(target=self.load_duplicate_index, args=(file_path,),
+                                 daemon=True).start()
             
             self.path_label.configure(text=os.path.basename(file_path))
-            self.update_status(f"Linked spreadsheet: {os.path.basename(file_path)}")
+            self.update_status(f"Linked spreadsheet: {os.path.basename(file_path)} "
+                               f"({self.csv_sink.describe()})")
+    
+    def load_duplicate_index(self, file_path):
+        """Seed the duplicate index from the linked file (runs on a worker thread)"""
+        try:
+            count = self.duplicate_index.load_file(file_path)
+            self.update_status(f"Loaded {count} previous scans from {os.path.basename(file_path)}")
+            # Index the existing rows now so the first history page doesn't have to
+            index = self.csv_index
+            if index is not None and index.path == file_path:
+                index.update()
+        except Exception as e:
+            self.update_status(f"Could not read previous scans: {str(e)}")
+
+    def change_flush_policy(self, event=None):
+        """Apply the selected flush policy to the linked file"""
+        if self.csv_sink:
+            self.csv_sink.set_policy(self.csv_flush_policy.get())
+            self.update_status(f"Flush policy: {self.csv_sink.describe()}")
     
-    def add_to_spreadsheet(self, data):
+    def load_older_history(self, before, limit):
+        """History rows from the linked CSV for scans that left the in-memory buffer.
+
+        The page is read on a worker thread and handed to the history on the
+        Tk thread. File rows are keyed by their row number, which
+        ``ScanHistory`` hands back as ``before`` for the next page; the first
+        page starts below the oldest in-memory scan that was saved.
+        """
+        index = self.csv_index
+        if index is None or not os.path.exists(index.path):
+            return []
+        threading.Thread(target=self.read_history_page, args=(index, before, limit),
+                         daemon=True).start()
+        return None
+
+    def read_history_page(self, index, before, limit):
+        """Worker thread: index any new rows of the linked CSV and read one history page"""
+        try:
+            with self.csv_lock:
+                if self.csv_sink:
+                    self.csv_sink.flush()
+                rows_written = self.rows_written
+                written_at = list(self.written_at)
+            index.update()
+            if isinstance(before, tuple):
+                end = before[1]
+            else:
+                # Rows this session wrote are numbered after those the file had when linked
+                newer = [row for recorded_at, row in written_at if recorded_at >= before]
+                end = index.base_rows + (min(newer) if newer else rows_written)
+            start = max(0, end - limit)
+            rows = [(("row", start + i), (time_of_day(timestamp), data))
+                    for i, (data, timestamp) in reversed(list(enumerate(index.read(start, end))))]
+        except Exception as e:
+            self.update_status(f"Could not read older scans: {str(e)}")
+            rows = []
+        self.root.after(0, self.show_history_page, index, before, rows)
+
+    def show_history_page(self, index, before, rows):
+        # Rows of a file that was unlinked meanwhile don't belong below the current ones
+        self.history.show_older(before, rows if index is self.csv_index else None)
+
+    def add_to_spreadsheet(self, data, recorded_at=None):
         """Add scanned data to spreadsheet"""
-        if not self.spreadsheet_path:
+        if not self.csv_sink:
             return False
         
         try:
-            with open(self.spreadsheet_path, 'a', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow([datetime.now().strftime('%Y-%m-%d %H:%M:%S'), data])
+            with self.csv_lock:
+                self.csv_sink.write_rows([[datetime.now().strftime('%Y-%m-%d %H:%M:%S'), data]])
+                if recorded_at is not None:
+                    self.written_at.append((recorded_at, self.rows_written))
+                self.rows_written += 1
             return True
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save to spreadsheet: {str(e)}")
+            self.root.after(0, messagebox.showerror, "Error",
+                            f"Failed to save to spreadsheet: {str(e)}")
             return False
     
     def update_status(self, message):
-        """Update status bar message"""
-        self.status_bar.configure(text=message)
+        """Update status bar message (safe to call from any thread)"""
+        if threading.current_thread() is threading.main_thread():
+            self.status_bar.configure(text=message)
+        else:
+            self.root.after(0, self.status_bar.configure, {'text': message})
+    
+    def safe_close(self):
+        """Stop scanning and close the spreadsheet before exiting"""
+        self.is_scanning = False
+        if self.pipeline:
+            self.pipeline.stop()
+        with self.csv_lock:
+            if self.csv_sink:
+                self.csv_sink.close()
+        self.root.destroy()
+
+def report_startup(args):
+    """Stop timing imports; print the report when asked for"""
+    startup.timer.uninstall()
+    if args.startup_report:
+        print(startup.timer.report(args.startup_target_ms))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enhanced QR Scanner")
+    parser.add_argument("--source", default=None,
+                        help="camera index, video file, image folder/glob or "
+                             "synthetic[:noise=N,blur=N,rotation=DEG,...] instead of the camera combobox")
+    parser.add_argument("--preview-fps", type=int, default=15,
+                        help="camera preview refresh rate; decoding runs at its own pace (default: 15)")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print per-module import times once the window is up")
+    parser.add_argument("--startup-target-ms", type=float, default=1000,
+                        help="cold-start budget the startup report checks against (default: 1000)")
+    args = parser.parse_args(argv)
 
-def main():
     root = tk.Tk()
     app = EnhancedQRScannerApp(root)
+    app.frame_source = args.source
+    app.preview.fps = args.preview_fps
+    root.after_idle(report_startup, args)
     root.mainloop()
 
 if __name__ == "__main__":
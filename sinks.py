@@ -0,0 +1,739 @@
+import csv
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from metrics import DISABLED
+
+HEADERS = ['SL No.', 'Timestamp', 'Data']
+LOG_START = "#start"  # Excel side-log line giving the workbook index of the next row
+
+
+def escape(text):
+    """XML-escape &, < and > (same as xml.sax.saxutils.escape, without its imports)"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def save_to_csv(path, sl_no, timestamp, data):
+    """Append one scan row to a CSV file, writing headers for a new file"""
+    if not os.path.exists(path):
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(HEADERS)
+
+    with open(path, 'a', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow([sl_no, timestamp, data])
+
+
+def save_to_xml(path, sl_no, timestamp, data):
+    """Append one <scan> element to an XML file"""
+    import xml.etree.ElementTree as ET
+
+    if not os.path.exists(path):
+        root = ET.Element("scans")
+        tree = ET.ElementTree(root)
+    else:
+        tree = ET.parse(path)
+        root = tree.getroot()
+
+    scan = ET.SubElement(root, "scan")
+    ET.SubElement(scan, "sl_no").text = str(sl_no)
+    ET.SubElement(scan, "timestamp").text = timestamp
+    ET.SubElement(scan, "data").text = data
+
+    tree.write(path)
+
+
+def save_to_excel(path, sl_no, timestamp, data):
+    """Append one scan row to an Excel workbook"""
+    import openpyxl
+
+    if not os.path.exists(path):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(HEADERS)
+    else:
+        wb = openpyxl.load_workbook(path)
+        ws = wb.active
+
+    ws.append([sl_no, timestamp, data])
+    wb.save(path)
+
+
+def save_to_google_sheets(service, spreadsheet_id, sl_no, timestamp, data):
+    """Append one scan row to a Google Sheet with its own API call"""
+    service.spreadsheets().values().append(
+        spreadsheetId=spreadsheet_id,
+        range='A:C',
+        valueInputOption='RAW',
+        insertDataOption='INSERT_ROWS',
+        body={'values': [[sl_no, timestamp, data]]}).execute()
+
+
+# CSV flush policies
+FLUSH_EVERY_ROW = "Flush every row"
+FLUSH_BATCHED = "Flush every N rows / T ms"
+FLUSH_GROUP_FSYNC = "Group-commit fsync"
+FLUSH_POLICIES = (FLUSH_EVERY_ROW, FLUSH_BATCHED, FLUSH_GROUP_FSYNC)
+
+
+class CsvSink:
+    """CSV writer that keeps the linked file open for the whole session.
+
+    ``flush_policy`` decides when buffered rows reach the disk:
+
+    * ``FLUSH_EVERY_ROW`` flushes to the OS after each write
+    * ``FLUSH_BATCHED`` flushes every ``flush_rows`` rows or ``flush_ms``
+      milliseconds, whichever comes first
+    * ``FLUSH_GROUP_FSYNC`` is batched like the above but also fsyncs, so
+      one fsync commits a whole group of rows
+    """
+
+    file_format = "CSV"
+
+    def __init__(self, path, truncate=False, headers=HEADERS, flush_policy=FLUSH_EVERY_ROW,
+                 flush_rows=50, flush_ms=500):
+        self.path = path
+        new_file = truncate or not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'w' if truncate else 'a', newline='')
+        self.writer = csv.writer(self.file)
+        self.lock = threading.Lock()
+        self.unflushed = 0
+        self.last_flush = time.monotonic()
+        self.timer = None
+        self.closed = threading.Event()
+        self.set_policy(flush_policy, flush_rows, flush_ms)
+        if new_file and headers:
+            self.write_rows([headers])
+            self.flush()
+
+    def set_policy(self, flush_policy, flush_rows=None, flush_ms=None):
+        """Change the flush policy; takes effect from the next row"""
+        if flush_policy not in FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy: {flush_policy}")
+        with self.lock:
+            self.flush_policy = flush_policy
+            if flush_rows is not None:
+                self.flush_rows = max(1, flush_rows)
+            if flush_ms is not None:
+                self.flush_ms = max(1, flush_ms)
+        if flush_policy != FLUSH_EVERY_ROW and self.timer is None:
+            # Makes sure a quiet station still gets its last rows on disk
+            self.timer = threading.Thread(target=self._flush_timer, name="csv-flush", daemon=True)
+            self.timer.start()
+
+    def describe(self):
+        if self.flush_policy == FLUSH_EVERY_ROW:
+            return self.flush_policy
+        return f"{self.flush_policy} (N={self.flush_rows}, T={self.flush_ms} ms)"
+
+    def write_rows(self, rows):
+        with self.lock:
+            self.writer.writerows(rows)
+            self.unflushed += len(rows)
+            if self.flush_policy == FLUSH_EVERY_ROW or self.unflushed >= self.flush_rows:
+                self._flush_locked()
+
+    def write(self, sl_no, timestamp, data):
+        self.write_rows([(sl_no, timestamp, data)])
+
+    def _flush_locked(self):
+        self.file.flush()
+        if self.flush_policy == FLUSH_GROUP_FSYNC:
+            os.fsync(self.file.fileno())
+        self.unflushed = 0
+        self.last_flush = time.monotonic()
+
+    def _flush_timer(self):
+        while not self.closed.wait(self.flush_ms / 1000.0):
+            with self.lock:
+                if self.unflushed and not self.file.closed:
+                    self._flush_locked()
+
+    def flush(self):
+        with self.lock:
+            if not self.file.closed:
+                self._flush_locked()
+
+    def close(self):
+        self.closed.set()
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+
+
+class XmlSink:
+    """Append-only XML writer that keeps the file open.
+
+    New <scan> elements are written over the closing </scans> tag, which is
+    re-written in the same call, so each row costs one small write no matter
+    how large the file is. If the previous session died mid-write the file is
+    repaired on open by truncating after the last complete </scan>.
+    """
+
+    file_format = "XML"
+    ROOT_OPEN = b"<scans>\n"
+    ROOT_CLOSE = b"</scans>\n"
+    TAIL_WINDOW = 4096
+
+    def __init__(self, path, truncate=False):
+        self.path = path
+        if truncate or not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as xmlfile:
+                xmlfile.write(self.ROOT_OPEN + self.ROOT_CLOSE)
+        self.file = open(path, 'r+b')
+        self.close_offset = self._find_close_offset()
+
+    def _find_close_offset(self):
+        """Locate the closing root tag, repairing a truncated or empty root"""
+        size = self.file.seek(0, os.SEEK_END)
+        window = min(size, self.TAIL_WINDOW)
+        self.file.seek(size - window)
+        tail = self.file.read(window)
+
+        position = tail.rfind(b"</scans>")
+        if position != -1:
+            return size - window + position
+
+        # Self-closing root written by ElementTree for an empty tree
+        position = tail.rfind(b"<scans />")
+        if position == -1:
+            position = tail.rfind(b"<scans/>")
+        if position != -1:
+            offset = size - window + position
+            self._rewrite_from(offset, self.ROOT_OPEN)
+            return offset + len(self.ROOT_OPEN)
+
+        # Crash while appending: drop the partial element after the last </scan>
+        self.file.seek(0)
+        content = self.file.read()
+        position = content.rfind(b"</scan>")
+        if position != -1:
+            offset = position + len(b"</scan>")
+        else:
+            offset = content.find(b"<scans>")
+            if offset == -1:
+                raise ValueError(f"Not a scans XML file: {self.path}")
+            offset += len(b"<scans>")
+        self._rewrite_from(offset, b"\n")
+        return offset + 1
+
+    def _rewrite_from(self, offset, data):
+        self.file.seek(offset)
+        self.file.write(data + self.ROOT_CLOSE)
+        self.file.truncate()
+        self.file.flush()
+
+    @staticmethod
+    def format_row(sl_no, timestamp, data):
+        return (f"<scan><sl_no>{escape(str(sl_no))}</sl_no>"
+                f"<timestamp>{escape(timestamp)}</timestamp>"
+                f"<data>{escape(data)}</data></scan>\n").encode("utf-8")
+
+    def write_rows(self, rows):
+        """Append (sl_no, timestamp, data) rows in a single write"""
+        chunk = b"".join(self.format_row(*row) for row in rows)
+        if not chunk:
+            return
+        self.file.seek(self.close_offset)
+        self.file.write(chunk + self.ROOT_CLOSE)
+        self.file.flush()
+        self.close_offset += len(chunk)
+
+    def write(self, sl_no, timestamp, data):
+        self.write_rows([(sl_no, timestamp, data)])
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+
+class ExcelSink:
+    """Excel writer that logs rows cheaply and rebuilds the .xlsx at checkpoints.
+
+    Each row is appended to an in-memory list and a CSV side log
+    (``<path>.log``), so per-scan cost does not depend on workbook size. The
+    workbook is materialised with openpyxl's write-only mode every
+    ``checkpoint_rows`` rows or ``checkpoint_seconds`` seconds (on a
+    background thread) and on ``close``. Checkpoints write to a temporary
+    file and atomically replace the workbook, so a crash never corrupts it;
+    rows logged since the last checkpoint are replayed on the next open.
+    Each log starts with the index of its first row, so rows a checkpoint
+    already saved are skipped rather than replayed twice.
+
+    Every row of the workbook is kept in memory and rewritten at each
+    checkpoint, so memory and checkpoint time grow with the file; for
+    workbooks beyond a few hundred thousand rows use CSV instead.
+    """
+
+    file_format = "Excel"
+
+    def __init__(self, path, truncate=False, checkpoint_rows=500, checkpoint_seconds=30.0):
+        self.path = path
+        self.log_path = path + ".log"
+        self.pending_path = path + ".pending"
+        self.checkpoint_rows = checkpoint_rows
+        self.checkpoint_seconds = checkpoint_seconds
+        self.lock = threading.Lock()
+        self.checkpoint_thread = None
+        self.last_checkpoint = time.monotonic()
+
+        if truncate:
+            for stale in (path, self.log_path, self.pending_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+        self.rows = self._load_rows()
+        replayed = self._replay(len(self.rows))
+        self.rows.extend(replayed)
+        self.dirty = len(replayed)
+        self._open_log(len(self.rows))
+        if replayed or not os.path.exists(path):
+            self.checkpoint(wait=True)
+
+    def _load_rows(self):
+        """Stream the existing workbook's rows into memory once"""
+        if not os.path.exists(self.path):
+            return []
+        import openpyxl
+
+        wb = openpyxl.load_workbook(self.path, read_only=True)
+        try:
+            rows = [list(row) for row in wb.active.iter_rows(values_only=True)]
+        finally:
+            wb.close()
+        if rows and rows[0] == HEADERS:
+            rows.pop(0)
+        return rows
+
+    def _replay(self, saved):
+        """Logged rows the workbook (holding ``saved`` rows) doesn't have yet"""
+        entries = self._read_log(self.pending_path) + self._read_log(self.log_path)
+        # Logs written before they recorded their position are replayed whole
+        replayed = [row for index, row in entries if index is None]
+        # A crash mid-checkpoint can leave rows in both logs, or in a log and the workbook
+        by_index = {index: row for index, row in entries if index is not None and index >= saved}
+        return replayed + [by_index[index] for index in sorted(by_index)]
+
+    @staticmethod
+    def _read_log(path):
+        """(row index, row) pairs from a side log"""
+        if not os.path.exists(path):
+            return []
+        entries, index = [], None
+        with open(path, newline='') as logfile:
+            for row in csv.reader(logfile):
+                if len(row) == 2 and row[0] == LOG_START:
+                    index = int(row[1])
+                elif len(row) == 3:
+                    entries.append((index, [int(row[0]) if row[0].isdigit() else row[0],
+                                            row[1], row[2]]))
+                    if index is not None:
+                        index += 1
+        return entries
+
+    def _open_log(self, start):
+        """Open the side log; a new one records ``start``, the index of its first row"""
+        self.log = open(self.log_path, 'a', newline='')
+        self.log_writer = csv.writer(self.log)
+        if self.log.tell() == 0:
+            self.log_writer.writerow([LOG_START, start])
+            self.log.flush()
+
+    def write_rows(self, rows):
+        """Append (sl_no, timestamp, data) rows to the log and the in-memory copy"""
+        with self.lock:
+            for row in rows:
+                self.log_writer.writerow(row)
+                self.rows.append(list(row))
+            self.log.flush()
+            self.dirty += len(rows)
+        if (self.dirty >= self.checkpoint_rows
+                or time.monotonic() - self.last_checkpoint >= self.checkpoint_seconds):
+            self.checkpoint()
+
+    def write(self, sl_no, timestamp, data):
+        self.write_rows([(sl_no, timestamp, data)])
+
+    def checkpoint(self, wait=False):
+        """Materialise the workbook; runs in the background unless ``wait``"""
+        if self.checkpoint_thread is not None and self.checkpoint_thread.is_alive():
+            if not wait:
+                return
+            self.checkpoint_thread.join()
+
+        with self.lock:
+            # Rows logged so far move to the pending log until the save succeeds
+            self.log.close()
+            if os.path.exists(self.pending_path):
+                with open(self.pending_path, 'a', newline='') as pending, \
+                        open(self.log_path, newline='') as logfile:
+                    pending.write(logfile.read())
+                os.remove(self.log_path)
+            else:
+                os.replace(self.log_path, self.pending_path)
+            count = len(self.rows)
+            self._open_log(count)
+            self.dirty = 0
+            self.last_checkpoint = time.monotonic()
+
+        if wait:
+            self._save(count)
+        else:
+            self.checkpoint_thread = threading.Thread(
+                target=self._save, args=(count,), name="excel-checkpoint", daemon=True)
+            self.checkpoint_thread.start()
+
+    def _save(self, count):
+        import openpyxl
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(HEADERS)
+        for i in range(count):
+            ws.append(self.rows[i])
+        tmp_path = self.path + ".tmp"
+        wb.save(tmp_path)
+        os.replace(tmp_path, self.path)
+        os.remove(self.pending_path)
+
+    def flush(self):
+        with self.lock:
+            self.log.flush()
+
+    def close(self):
+        if self.log.closed:
+            return
+        if self.checkpoint_thread is not None:
+            self.checkpoint_thread.join()
+        if self.dirty or os.path.exists(self.pending_path):
+            self.checkpoint(wait=True)
+        with self.lock:
+            self.log.close()
+            if os.path.exists(self.log_path) and not self.dirty:
+                os.remove(self.log_path)  # Only its start line is left
+
+
+class Outbox:
+    """Append-only disk spool for rows bound for Google Sheets.
+
+    Every row is written as one JSON line before it is queued for upload, and
+    the byte offset of the first unacknowledged row is kept in
+    ``<path>.offset``. Keys of the batch currently being sent are kept in
+    ``<path>.inflight`` so a restart can tell whether that batch already
+    reached the sheet. Once everything is acknowledged the spool is truncated.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset_path = path + ".offset"
+        self.inflight_path = path + ".inflight"
+        self.lock = threading.Lock()
+        self.acked_offset = 0
+        if os.path.exists(self.offset_path):
+            with open(self.offset_path) as offset_file:
+                self.acked_offset = int(offset_file.read().strip() or 0)
+        self.file = open(path, 'a+b')
+        self.ends = deque()
+
+    @staticmethod
+    def key_for(row):
+        """Idempotency key: serial number plus timestamp"""
+        return f"{row[0]}|{row[1]}"
+
+    def unacked(self):
+        """Rows spooled but not yet acknowledged, oldest first"""
+        with self.lock:
+            self.file.seek(self.acked_offset)
+            rows = []
+            offset = self.acked_offset
+            self.ends.clear()
+            for line in self.file:
+                try:
+                    row = json.loads(line)['row']
+                except (ValueError, KeyError):
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                rows.append(row)
+                self.ends.append(offset)
+            # Drop a line torn by a crash so new rows start on a clean line
+            self.file.truncate(offset)
+            self.file.seek(0, os.SEEK_END)
+            return rows
+
+    def append(self, rows):
+        """Spool rows with one sequential write"""
+        lines = [json.dumps({'key': self.key_for(row), 'row': list(row)}).encode("utf-8") + b"\n"
+                 for row in rows]
+        with self.lock:
+            offset = self.file.seek(0, os.SEEK_END)
+            self.file.write(b"".join(lines))
+            self.file.flush()
+            for line in lines:
+                offset += len(line)
+                self.ends.append(offset)
+
+    def mark_in_flight(self, rows):
+        self._replace(self.inflight_path, "\n".join(self.key_for(row) for row in rows))
+
+    def in_flight_keys(self):
+        if not os.path.exists(self.inflight_path):
+            return []
+        with open(self.inflight_path) as inflight:
+            return [key for key in inflight.read().splitlines() if key]
+
+    def ack(self, count):
+        """Mark the oldest ``count`` spooled rows as delivered"""
+        with self.lock:
+            for _ in range(count):
+                self.acked_offset = self.ends.popleft()
+            if not self.ends and self.acked_offset == self.file.seek(0, os.SEEK_END):
+                self.file.truncate(0)
+                self.acked_offset = 0
+            self._replace(self.offset_path, str(self.acked_offset))
+        if os.path.exists(self.inflight_path):
+            os.remove(self.inflight_path)
+
+    @staticmethod
+    def _replace(path, text):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as tmp:
+            tmp.write(text)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class SheetsWriter:
+    """Write-behind batching for Google Sheets appends.
+
+    ``write_rows`` only queues rows; a background thread coalesces everything
+    pending into one multi-row ``values().append`` call once ``batch_size``
+    rows are waiting or the oldest has waited ``flush_interval`` seconds.
+    Rate-limit and transient errors are retried with exponential backoff and
+    jitter; other errors are passed to ``on_error`` and the batch is dropped.
+
+    With an ``outbox`` every row is spooled to disk first and nothing is
+    dropped: failed batches stay queued and are retried until they go
+    through, and rows left over from a previous run are sent first.
+
+    Each round trip is timed in ``metrics`` as ``sheets_request``.
+
+    ``service`` only needs ``spreadsheets().values().append(...).execute()``,
+    so a local fake can stand in for the real API client.
+    """
+
+    file_format = "Google Sheets"
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    CLOSE_RETRIES = 3
+
+    def __init__(self, service, spreadsheet_id, batch_size=50, flush_interval=2.0,
+                 max_backoff=64.0, on_error=None, outbox=None, metrics=None):
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.path = spreadsheet_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.on_error = on_error
+        self.metrics = metrics or DISABLED
+        self.outbox = outbox
+        self.pending = deque()
+        if outbox is not None:
+            self.pending.extend((0.0, row) for row in outbox.unacked())
+        self.in_flight = 0
+        self.appends = 0
+        self.retries = 0
+        self.condition = threading.Condition()
+        self.closing = False
+        self.flush_requested = False
+        self.thread = threading.Thread(target=self._run, name="sheets-writer", daemon=True)
+        self.thread.start()
+
+    @property
+    def queue_depth(self):
+        """Rows accepted but not yet confirmed by the Sheets API"""
+        return len(self.pending) + self.in_flight
+
+    def write_rows(self, rows):
+        with self.condition:
+            if self.outbox is not None:
+                self.outbox.append(rows)
+            self.pending.extend((time.monotonic(), list(row)) for row in rows)
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify()
+
+    def write(self, sl_no, timestamp, data):
+        self.write_rows([(sl_no, timestamp, data)])
+
+    def flush(self):
+        """Ask the writer to send whatever is pending now"""
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify()
+
+    def close(self, timeout=10.0):
+        """Flush pending rows and stop the writer thread"""
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+        self.thread.join(timeout)
+        if self.outbox is not None and not self.thread.is_alive():
+            self.outbox.close()
+
+    def is_retryable(self, error):
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+        if status is not None:
+            return int(status) in self.RETRY_STATUSES
+        return isinstance(error, (OSError, TimeoutError))
+
+    def _next_batch(self):
+        """Wait until a batch is due and take it off the queue"""
+        with self.condition:
+            while True:
+                if self.pending:
+                    oldest = self.pending[0][0]
+                    due = oldest + self.flush_interval - time.monotonic()
+                    if (self.closing or self.flush_requested
+                            or len(self.pending) >= self.batch_size or due <= 0):
+                        break
+                    self.condition.wait(due)
+                elif self.closing:
+                    return None
+                else:
+                    self.flush_requested = False
+                    self.condition.wait()
+            count = min(len(self.pending), self.batch_size)
+            batch = [self.pending.popleft()[1] for _ in range(count)]
+            self.in_flight = len(batch)
+            if not self.pending:
+                self.flush_requested = False
+            return batch
+
+    def _append(self, batch):
+        self.service.spreadsheets().values().append(
+            spreadsheetId=self.spreadsheet_id,
+            range='A:C',
+            valueInputOption='RAW',
+            insertDataOption='INSERT_ROWS',
+            body={'values': batch}).execute()
+        self.appends += 1
+
+    def _recover(self):
+        """Skip the batch that was in flight at a crash if it reached the sheet"""
+        keys = self.outbox.in_flight_keys()
+        if not keys or not self.pending:
+            return
+        try:
+            result = self.service.spreadsheets().values().get(
+                spreadsheetId=self.spreadsheet_id, range='A:B').execute()
+        except Exception:
+            return  # Can't tell; sending again beats losing the rows
+        existing = {f"{row[0]}|{row[1]}" for row in result.get('values', []) if len(row) >= 2}
+        if keys[0] in existing:
+            # One append call is all-or-nothing, so the whole batch landed
+            with self.condition:
+                count = min(len(keys), len(self.pending))
+                for _ in range(count):
+                    self.pending.popleft()
+            self.outbox.ack(count)
+
+    def _send(self, batch):
+        """Append one batch, retrying as allowed; returns True once delivered"""
+        delay = 1.0
+        attempt = 0
+        while True:
+            try:
+                if self.outbox is not None:
+                    self.outbox.mark_in_flight(batch)
+                start = time.perf_counter()
+                try:
+                    self._append(batch)
+                finally:
+                    self.metrics.observe("sheets_request", time.perf_counter() - start)
+                if self.outbox is not None:
+                    self.outbox.ack(len(batch))
+                return True
+            except Exception as e:
+                attempt += 1
+                self.metrics.inc("sheets_errors")
+                durable = self.outbox is not None
+                # Don't keep a closing app hostage to an outage
+                if (self.closing and attempt > self.CLOSE_RETRIES) or \
+                        (not durable and not self.is_retryable(e)):
+                    if self.on_error:
+                        kept = "kept in outbox" if durable else "dropped"
+                        self.on_error(f"Failed to save {len(batch)} rows to Google Sheets "
+                                      f"({kept}): {str(e)}")
+                    return False
+                if durable and attempt == 1 and self.on_error:
+                    self.on_error(f"Google Sheets unavailable, {self.queue_depth} rows "
+                                  f"waiting in outbox: {str(e)}")
+                self.retries += 1
+                time.sleep(min(delay, self.max_backoff) * random.uniform(0.5, 1.0))
+                delay *= 2
+
+    def _run(self):
+        if self.outbox is not None:
+            self._recover()
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            delivered = self._send(batch)
+            self.in_flight = 0
+            if not delivered and self.outbox is not None:
+                return  # Only reached while closing; the outbox replays next run
+
+
+def open_sink(path, file_format, truncate=False, **options):
+    """Open a persistent sink for ``path`` in the given file format.
+
+    Extra keyword options configure the sink types that understand them
+    (e.g. Excel checkpoints) and are ignored by the others.
+    """
+    if file_format == "XML":
+        return XmlSink(path, truncate=truncate)
+    if file_format == "Excel":
+        return ExcelSink(path, truncate=truncate,
+                         **{k: v for k, v in options.items() if k.startswith("checkpoint_")})
+    if file_format == "CSV":
+        return CsvSink(path, truncate=truncate,
+                       **{k: v for k, v in options.items() if k.startswith("flush_")})
+    raise ValueError(f"Unsupported file format: {file_format}")
+
+
+FILE_WRITERS = {
+    "CSV": save_to_csv,
+    "XML": save_to_xml,
+    "Excel": save_to_excel,
+}
+
+EXTENSION_FORMATS = {
+    ".csv": "CSV",
+    ".xml": "XML",
+    ".xlsx": "Excel",
+}
+
+
+def format_for_path(path):
+    """Guess the file format ("CSV", "XML", "Excel") from a file extension"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXTENSION_FORMATS:
+        raise ValueError(f"Unsupported output file type: {ext or path}")
+    return EXTENSION_FORMATS[ext]
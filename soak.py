@@ -0,0 +1,378 @@
+"""Soak test: drive the scan path for hours and watch for leaks and drift.
+
+Usage:
+    python soak.py --duration 12h --speedup 60          # a 12-hour shift in 12 minutes
+    python soak.py --duration 2h --speedup 20 --format Excel
+    python soak.py --duration 1h --gui                  # through the desktop app (needs a display)
+
+A synthetic camera feeds frames at ``--fps``; a new label comes into view
+``--scans-per-minute`` times per simulated minute, and the simulated clock
+runs ``--speedup`` times faster than the wall clock (duplicate windows and
+export/checkpoint intervals follow it). Frames go through the same pipeline,
+decoder, duplicate index, journal and exporters the app uses.
+
+Every ``--sample-interval`` seconds RSS, thread count, open file handles and
+per-stage latency are recorded. After ``--warmup`` the run fails (exit code
+1) if any of them grows past its threshold. Results go to ``--output``
+(timeline.csv and summary.json).
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import sinks
+from decoding import DecodeLadder, RoiTracker
+from dedupe import DuplicateIndex
+from frame_sources import SyntheticQRSource
+from journal import ScanJournal, Exporter
+from metrics import Metrics
+from pipeline import ScanPipeline
+
+STAGES = ("capture", "decode", "record", "dedupe", "journal_append", "sink_write")
+TIMESTAMP = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_duration(text):
+    """'90s', '45m', '12h' or plain seconds"""
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    text = str(text).strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+class SimClock:
+    """Wall clock sped up ``speedup`` times from the moment it is created"""
+
+    def __init__(self, speedup=1.0):
+        self.speedup = speedup
+        self.wall_start = time.time()
+        self.mono_start = time.monotonic()
+
+    def elapsed(self):
+        """Simulated seconds since the start"""
+        return (time.monotonic() - self.mono_start) * self.speedup
+
+    def now(self):
+        """Simulated epoch time"""
+        return self.wall_start + self.elapsed()
+
+
+class SoakSource(SyntheticQRSource):
+    """Synthetic camera where a new label appears every 1/``scans_per_minute`` simulated minutes"""
+
+    def __init__(self, clock, scans_per_minute=20, **options):
+        super().__init__(**options)
+        self.clock = clock
+        self.scans_per_minute = scans_per_minute
+
+    def payload_for(self, index):
+        return f"SOAK-{int(self.clock.elapsed() / 60 * self.scans_per_minute):08d}"
+
+
+def process_stats():
+    """RSS in MiB, thread count and open file handles of this process"""
+    rss = None
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        pass
+    if rss is None:
+        # Peak rather than current, but still shows growth (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        handles = len(os.listdir("/proc/self/fd"))
+    except OSError:
+        handles = None
+    return rss, threading.active_count(), handles
+
+
+class Sampler:
+    """Periodic samples of process stats and per-stage latency from ``metrics``"""
+
+    def __init__(self, metrics, clock):
+        self.metrics = metrics
+        self.clock = clock
+        self.samples = []
+        self.started = time.monotonic()
+        self.last_frames = 0
+
+    def sample(self):
+        rss, threads, handles = process_stats()
+        snapshot = self.metrics.snapshot()
+        self.metrics.reset()  # Each sample covers one interval
+        frames = snapshot['counters'].get('frames_captured', 0)
+        row = {'wall_s': round(time.monotonic() - self.started, 1),
+               'sim_h': round(self.clock.elapsed() / 3600, 3),
+               'rss_mb': round(rss, 1),
+               'threads': threads,
+               'handles': handles,
+               'frames': frames,
+               'scans': snapshot['counters'].get('codes_accepted', 0)}
+        for stage in STAGES:
+            latency = {}
+            for name, summary in snapshot['latency_seconds'].items():
+                if name == stage or name.startswith(stage + "{"):
+                    latency = summary
+            mean = latency.get('mean')
+            row[f"{stage}_ms"] = round(mean * 1000, 3) if mean is not None else None
+        self.samples.append(row)
+        return row
+
+
+def mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def evaluate(samples, warmup, thresholds, window=3):
+    """Compare the first samples after warm-up with the last ones; returns failures"""
+    settled = [row for row in samples if row['wall_s'] >= warmup]
+    if len(settled) < 2 * window:
+        return [f"not enough samples after warm-up ({len(settled)}); run longer"], {}
+    first, last = settled[:window], settled[-window:]
+    growth = {}
+    failures = []
+    for key, limit in (('rss_mb', thresholds['rss_mb']),
+                       ('threads', thresholds['threads']),
+                       ('handles', thresholds['handles'])):
+        before, after = mean(row[key] for row in first), mean(row[key] for row in last)
+        if before is None or after is None:
+            continue
+        growth[key] = after - before
+        if growth[key] > limit:
+            failures.append(f"{key} grew by {growth[key]:.1f} (limit {limit})")
+    for stage in STAGES:
+        key = f"{stage}_ms"
+        before, after = mean(row[key] for row in first), mean(row[key] for row in last)
+        if not before or after is None:
+            continue
+        growth[key] = after / before
+        # Ignore drift in stages that stay negligible either way
+        if growth[key] > thresholds['latency'] and after > thresholds['latency_floor_ms']:
+            failures.append(f"{stage} latency drifted {growth[key]:.1f}x "
+                            f"({before:.2f} -> {after:.2f} ms, limit {thresholds['latency']}x)")
+    return failures, growth
+
+
+def export_path(workdir, file_format):
+    """The soak export file in ``workdir``, with the extension for ``file_format``"""
+    extension = {fmt: ext for ext, fmt in sinks.EXTENSION_FORMATS.items()}[file_format]
+    return os.path.join(workdir, "soak" + extension)
+
+
+def run_headless(args, clock, metrics, workdir, sampler):
+    """The app's scan path without Tk: pipeline -> decode -> dedupe -> journal -> exporter"""
+    journal = ScanJournal(os.path.join(workdir, "soak.db"))
+    target = export_path(workdir, args.format)
+    # Time-based sink settings follow the simulated clock
+    sink = sinks.open_sink(target, args.format, truncate=True,
+                           checkpoint_seconds=30.0 / args.speedup,
+                           flush_ms=max(1, int(500 / args.speedup)))
+    exporter = Exporter(journal, sink, target, poll_interval=0.5 / args.speedup,
+                        metrics=metrics)
+    index = DuplicateIndex(ttl=args.repeat_after * 60 if args.repeat_after else None)
+    tracker = RoiTracker()
+    ladder = DecodeLadder(metrics=metrics)
+    source = SoakSource(clock, args.scans_per_minute, width=args.width, height=args.height,
+                        qr_size=min(args.width, args.height) // 3, noise=args.noise,
+                        fps=args.fps, seed=1)
+    sl_no = [1]
+
+    def decode(frame):
+        return [result.data for result in tracker.decode(frame, ladder.decode)]
+
+    def record(frame, codes):
+        start = time.perf_counter()
+        now = clock.now()
+        accepted = [data for data in dict.fromkeys(codes) if index.check_and_add(data, now)]
+        metrics.observe("dedupe", time.perf_counter() - start)
+        if not accepted:
+            return
+        metrics.inc("codes_accepted", len(accepted))
+        timestamp = datetime.fromtimestamp(now).strftime(TIMESTAMP)
+        rows = [(sl_no[0] + i, timestamp, data) for i, data in enumerate(accepted)]
+        sl_no[0] += len(rows)
+        start = time.perf_counter()
+        journal.append(rows, same_frame=len(rows) > 1, target=exporter.name)
+        metrics.observe("journal_append", time.perf_counter() - start)
+
+    errors = []
+    pipeline = ScanPipeline(lambda: source, decode, record, on_error=errors.append,
+                            metrics=metrics)
+    if not pipeline.start():
+        raise RuntimeError("Could not start the synthetic source")
+    try:
+        sample_loop(args, clock, sampler, lambda: bool(pipeline.running))
+    finally:
+        pipeline.stop(wait=True)
+        exporter.close()
+        journal.close()
+    return errors
+
+
+def run_gui(args, clock, metrics, workdir, sampler):
+    """Drive the desktop app itself (history tree, preview, toasts) in continuous mode.
+
+    The app's duplicate window runs on the wall clock, so only the synthetic
+    labels follow the simulated clock here.
+    """
+    import tkinter as tk
+
+    cwd = os.getcwd()
+    os.chdir(workdir)  # The app keeps its journal and caches in the working directory
+    errors = []
+    try:
+        import startup
+        from qr_google import EnhancedQRScannerApp
+        startup.timer.uninstall()
+
+        root = tk.Tk()
+        app = EnhancedQRScannerApp(root)
+        app.show_error = lambda title, message: errors.append(message)
+        app.metrics.enabled = True
+        sampler.metrics = app.metrics  # Already wired into the app's pipeline and exporters
+        app.continuous_mode.set(True)
+        app.spreadsheet_path = export_path(workdir, args.format)
+        app.file_format.set(args.format)
+        app.frame_source = SoakSource(clock, args.scans_per_minute, width=args.width,
+                                      height=args.height, qr_size=min(args.width, args.height) // 3,
+                                      noise=args.noise, fps=args.fps, seed=1)
+        app.is_scanning = True
+        app.scan_qr()
+
+        deadline = time.monotonic() + args.duration / args.speedup
+        next_sample = time.monotonic() + args.sample_interval
+
+        def tick():
+            nonlocal next_sample
+            if time.monotonic() >= next_sample:
+                report(sampler.sample())
+                next_sample += args.sample_interval
+            if time.monotonic() >= deadline or not app.pipeline:
+                root.quit()
+                return
+            root.after(200, tick)
+
+        root.after(200, tick)
+        root.mainloop()
+        app.stop_scanning()
+        app.close_exporters()
+        app.journal.close()
+        root.destroy()
+    finally:
+        os.chdir(cwd)
+    return errors
+
+
+def report(row):
+    print(f"[{row['wall_s']:>7.0f}s sim {row['sim_h']:6.2f}h] rss {row['rss_mb']:7.1f} MiB  "
+          f"threads {row['threads']:3d}  handles {row['handles']}  frames {row['frames']:5d}  "
+          f"scans {row['scans']:4d}  decode {row['decode_ms']} ms")
+
+
+def sample_loop(args, clock, sampler, alive):
+    deadline = time.monotonic() + args.duration / args.speedup
+    while time.monotonic() < deadline and alive():
+        time.sleep(min(args.sample_interval, max(0.0, deadline - time.monotonic())))
+        report(sampler.sample())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak test for leaks and latency drift")
+    parser.add_argument("--duration", default="12h",
+                        help="simulated run length, e.g. 90m or 12h (default: 12h)")
+    parser.add_argument("--speedup", type=float, default=60.0,
+                        help="simulated seconds per wall-clock second (default: 60)")
+    parser.add_argument("--fps", type=float, default=15.0,
+                        help="synthetic camera frame rate (wall clock, default: 15)")
+    parser.add_argument("--scans-per-minute", type=float, default=20.0,
+                        help="new labels per simulated minute (default: 20)")
+    parser.add_argument("--repeat-after", type=float, default=10.0,
+                        help="duplicate window in simulated minutes, 0 = never (default: 10)")
+    parser.add_argument("--format", default="CSV", choices=["CSV", "XML", "Excel"],
+                        help="export format (default: CSV)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--noise", type=float, default=4.0)
+    parser.add_argument("--sample-interval", type=float, default=5.0,
+                        help="wall-clock seconds between samples (default: 5)")
+    parser.add_argument("--warmup", type=float, default=30.0,
+                        help="wall-clock seconds ignored before growth is measured (default: 30)")
+    parser.add_argument("--max-rss-growth", type=float, default=50.0,
+                        help="allowed RSS growth in MiB (default: 50)")
+    parser.add_argument("--max-thread-growth", type=int, default=2,
+                        help="allowed growth in thread count (default: 2)")
+    parser.add_argument("--max-handle-growth", type=int, default=5,
+                        help="allowed growth in open file handles (default: 5)")
+    parser.add_argument("--max-latency-drift", type=float, default=2.0,
+                        help="allowed ratio of final to initial mean stage latency (default: 2)")
+    parser.add_argument("--latency-floor-ms", type=float, default=1.0,
+                        help="stages faster than this are not checked for drift (default: 1)")
+    parser.add_argument("--gui", action="store_true",
+                        help="drive the desktop app instead of the headless scan path")
+    parser.add_argument("-o", "--output", default="soak-results",
+                        help="folder for timeline.csv and summary.json (default: soak-results)")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the working folder with the journal and export file")
+    args = parser.parse_args(argv)
+    args.duration = parse_duration(args.duration)
+
+    clock = SimClock(args.speedup)
+    metrics = Metrics()
+    sampler = Sampler(metrics, clock)
+    labels_per_second = args.scans_per_minute / 60 * args.speedup
+    if labels_per_second * 2 > args.fps:
+        print(f"Note: {labels_per_second:.1f} labels/s at {args.fps:g} fps; most labels will be "
+              "missed (lower --speedup or --scans-per-minute to record every one)")
+    workdir = tempfile.mkdtemp(prefix="qr-soak-")
+    print(f"Soaking {args.duration / 3600:.1f} simulated hours in "
+          f"{args.duration / args.speedup / 60:.1f} minutes (work dir {workdir})")
+    try:
+        run = run_gui if args.gui else run_headless
+        errors = run(args, clock, metrics, workdir, sampler)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    thresholds = {'rss_mb': args.max_rss_growth, 'threads': args.max_thread_growth,
+                  'handles': args.max_handle_growth, 'latency': args.max_latency_drift,
+                  'latency_floor_ms': args.latency_floor_ms}
+    failures, growth = evaluate(sampler.samples, args.warmup, thresholds)
+    if errors:
+        failures.append(f"{len(errors)} pipeline errors, first: {errors[0]}")
+
+    os.makedirs(args.output, exist_ok=True)
+    if sampler.samples:
+        with open(os.path.join(args.output, "timeline.csv"), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(sampler.samples[0]))
+            writer.writeheader()
+            writer.writerows(sampler.samples)
+    with open(os.path.join(args.output, "summary.json"), "w") as f:
+        json.dump({'args': vars(args), 'thresholds': thresholds, 'growth': growth,
+                   'failures': failures, 'passed': not failures}, f, indent=2)
+
+    for name, value in growth.items():
+        print(f"  {name}: {value:+.2f}" if not name.endswith("_ms") else f"  {name}: {value:.2f}x")
+    if failures:
+        print("FAILED:\n  " + "\n  ".join(failures))
+        return 1
+    print("PASSED")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import builtins
+import sys
+import threading
+import time
+
+STARTED = time.perf_counter()
+
+
+class ImportTimer:
+    """Records how long each top-level import takes (self and dependencies).
+
+    Installed as a wrapper around ``builtins.__import__`` as early as
+    possible; only the outermost import of a module not yet in
+    ``sys.modules`` is timed, so nested imports count towards the module
+    that pulled them in. Imports made later (e.g. the Google client when
+    Sheets is enabled) are recorded as well until ``uninstall()``.
+    """
+
+    def __init__(self):
+        self.times = {}  # module name -> seconds, in import order
+        self.local = threading.local()
+        self._original = None
+
+    def install(self):
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+        return self
+
+    def uninstall(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original or builtins.__import__
+        local = self.local
+        if getattr(local, "nested", False) or level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+        local.nested = True
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            local.nested = False
+            self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+
+    def report(self, target_ms=None, top=15):
+        """Text report: slowest imports and time since the process started"""
+        elapsed_ms = (time.perf_counter() - STARTED) * 1000
+        lines = [f"Startup: {elapsed_ms:.0f} ms"
+                 + (f" (target {target_ms:.0f} ms)" if target_ms else "")]
+        ranked = sorted(self.times.items(), key=lambda item: item[1], reverse=True)
+        for name, seconds in ranked[:top]:
+            lines.append(f"  {seconds * 1000:8.1f} ms  {name}")
+        if target_ms and elapsed_ms > target_ms:
+            lines.append(f"  over target by {elapsed_ms - target_ms:.0f} ms")
+        return "\n".join(lines)
+
+
+timer = ImportTimer()